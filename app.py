@@ -1,11 +1,18 @@
 from PyQt6.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, 
                              QVBoxLayout, QHBoxLayout, QFileDialog, QComboBox, 
-                             QProgressBar, QMessageBox, QGridLayout, QStackedWidget)
+                             QProgressBar, QMessageBox, QGridLayout, QStackedWidget, QSpinBox,
+                             QCheckBox)
 from PyQt6.QtGui import QFont, QPixmap, QIcon
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QStandardPaths
 import sys
 import os
-from PIL import Image
+import multiprocessing
+from tagging import TagManifest, badges_recipe, discover_tags, output_name, tag_image_incremental
+from batch import IMAGE_EXTENSIONS, claim_outputs, default_worker_count
+from encoders import DEFAULT_PROFILE, EncoderReport, available_profiles
+from workers import PoolWorker, ThumbnailLoader
+
+IMAGE_FILTER = "Images (" + " ".join("*" + ext for ext in IMAGE_EXTENSIONS) + ")"
 
 # Cesta k obrázkom so štítkami
 if getattr(sys, 'frozen', False):
@@ -13,14 +20,6 @@ if getattr(sys, 'frozen', False):
 else:
     IMAGE_PATH = os.path.join(os.path.expanduser("~"), "Desktop","Vyvoj(kopie)", "images")
 
-TAG_IMAGES = [
-    "2x_pack.png", "3x_pack.png", "4x_pack.png", "5x_pack.png", "6x_pack.png", 
-    "7x_pack.png", "8x_pack.png", "9x_pack.png", "10x_pack.png", "12x_pack.png",
-    "18x_pack.png", "24x_pack.png", "bio.png", "chlazene.png", "gluten free.png", 
-    "lactose free.png", "mražené.png", "nízká cena.png", "Od farmáře.png", 
-    "pet.png", "protein.png", "vegan.png", "novinka.png","prosekarna.png","jen_u_nas.png","balení.png","1kg.png","500g.png","UAflag.png"
-]
-
 class MyApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -29,6 +28,11 @@ class MyApp(QWidget):
         self.setStyleSheet("background-color: #FFEBEE; color: black;")
         
         self.button_font = QFont("Montserrat", 12, QFont.Weight.Bold)
+        self.worker = None
+        self.manifest = None
+        self.encoder_report = None
+        self.profile = None  # Profil bežiacej dávky – výber v GUI sa počas behu môže zmeniť
+        self.badges = []  # Zoznam (štítok, pozícia) pre viac štítkov naraz
         self.selected_position = (2, 0)  # Predvolená pozícia (prvý riadok, tretí stĺpec)
 
         layout = QVBoxLayout()
@@ -43,6 +47,15 @@ class MyApp(QWidget):
         self.load_tag_images()
         self.tag_dropdown.currentIndexChanged.connect(self.check_ready)
 
+        self.button_add_badge = self.create_button("Pridať štítok")
+        self.button_add_badge.clicked.connect(self.add_badge)
+
+        self.button_clear_badges = self.create_button("Vymazať štítky")
+        self.button_clear_badges.clicked.connect(self.clear_badges)
+
+        self.badges_label = QLabel("Štítky: len vybraný štítok")
+        self.badges_label.setWordWrap(True)
+
         self.button_run = self.create_button("Spustiť", enabled=False)
         self.button_run.clicked.connect(self.process_images)
 
@@ -50,11 +63,39 @@ class MyApp(QWidget):
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
 
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Počet procesov:"))
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, 64)
+        self.workers_spinbox.setValue(default_worker_count())
+        workers_layout.addWidget(self.workers_spinbox)
+
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Formát výstupu:"))
+        self.profile_dropdown = QComboBox()
+        self.profile_dropdown.addItems(available_profiles())
+        self.profile_dropdown.setCurrentText(DEFAULT_PROFILE)
+        profile_layout.addWidget(self.profile_dropdown)
+
+        self.force_checkbox = QCheckBox("Prepísať aj nezmenené výstupy")
+
+        self.button_cancel = self.create_button("Zrušiť", enabled=False)
+        self.button_cancel.clicked.connect(self.cancel_processing)
+
         layout.addWidget(self.button_select_images)
         layout.addWidget(self.button_select_folder)
         layout.addWidget(self.tag_dropdown)
         layout.addWidget(self.create_position_selector())
+        badge_buttons_layout = QHBoxLayout()
+        badge_buttons_layout.addWidget(self.button_add_badge)
+        badge_buttons_layout.addWidget(self.button_clear_badges)
+        layout.addLayout(badge_buttons_layout)
+        layout.addWidget(self.badges_label)
+        layout.addLayout(workers_layout)
+        layout.addLayout(profile_layout)
+        layout.addWidget(self.force_checkbox)
         layout.addWidget(self.button_run)
+        layout.addWidget(self.button_cancel)
         layout.addWidget(self.progress_bar)
 
         self.setLayout(layout)
@@ -151,14 +192,44 @@ class MyApp(QWidget):
 
     
     def load_tag_images(self):
-        for tag in TAG_IMAGES:
-            path = os.path.join(IMAGE_PATH, tag)
-            if os.path.exists(path):
-                icon = QIcon(QPixmap(path).scaled(32, 32, Qt.AspectRatioMode.KeepAspectRatio))
-                self.tag_dropdown.addItem(icon, tag)
+        # Štítky sa hľadajú v priečinku, náhľady dobehnú z vlákna – dovtedy je v zozname placeholder
+        placeholder = QPixmap(32, 32)
+        placeholder.fill(Qt.GlobalColor.lightGray)
+        tags = discover_tags(IMAGE_PATH)
+        for tag in tags:
+            self.tag_dropdown.addItem(QIcon(placeholder), tag)
+
+        cache_dir = os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation),
+            "ImgOps", "tag_thumbnails")
+        self.thumbnail_loader = ThumbnailLoader([os.path.join(IMAGE_PATH, tag) for tag in tags], cache_dir, 32, self)
+        self.thumbnail_loader.thumbnail_ready.connect(self.set_tag_thumbnail)
+        self.thumbnail_loader.start()
+
+    def set_tag_thumbnail(self, tag_path, image):
+        index = self.tag_dropdown.findText(os.path.basename(tag_path))
+        if index >= 0:
+            self.tag_dropdown.setItemIcon(index, QIcon(QPixmap.fromImage(image)))
     
+    def add_badge(self):
+        if self.tag_dropdown.currentIndex() < 0:
+            return
+        self.badges.append((self.tag_dropdown.currentText(), self.selected_position))
+        self.update_badges_label()
+
+    def clear_badges(self):
+        self.badges = []
+        self.update_badges_label()
+
+    def update_badges_label(self):
+        if not self.badges:
+            self.badges_label.setText("Štítky: len vybraný štítok")
+            return
+        items = [f"{tag} ({row + 1},{col + 1})" for tag, (row, col) in self.badges]
+        self.badges_label.setText("Štítky: " + ", ".join(items))
+
     def select_images(self):
-        self.selected_files, _ = QFileDialog.getOpenFileNames(self, "Vyberte obrázky", "", "Images (*.png *.jpg *.jpeg)")
+        self.selected_files, _ = QFileDialog.getOpenFileNames(self, "Vyberte obrázky", "", IMAGE_FILTER)
         self.check_ready()
     
     def select_folder(self):
@@ -166,7 +237,7 @@ class MyApp(QWidget):
         self.check_ready()
     
     def check_ready(self):
-        ready = hasattr(self, 'selected_files') and hasattr(self, 'selected_folder') and self.tag_dropdown.currentIndex() >= 0
+        ready = hasattr(self, 'selected_files') and hasattr(self, 'selected_folder') and self.tag_dropdown.currentIndex() >= 0 and self.worker is None
         self.button_run.setEnabled(ready)
         if ready:
             self.set_button_style(self.button_run, True)
@@ -174,34 +245,87 @@ class MyApp(QWidget):
             self.set_button_style(self.button_run, False)
     
     def process_images(self):
-        tag_name = self.tag_dropdown.currentText()
-        tag_path = os.path.join(IMAGE_PATH, tag_name)
+        # Bez pridaných štítkov sa použije len aktuálne vybraný štítok a pozícia
+        selected = self.badges or [(self.tag_dropdown.currentText(), self.selected_position)]
 
-        if not os.path.exists(tag_path):
-            QMessageBox.warning(self, "Chyba", f"Štítok {tag_name} sa nenašiel!")
-            return
+        badges = []
+        for tag_name, position in selected:
+            tag_path = os.path.join(IMAGE_PATH, tag_name)
+            if not os.path.exists(tag_path):
+                QMessageBox.warning(self, "Chyba", f"Štítok {tag_name} sa nenašiel!")
+                return
+            badges.append((tag_path, position))
+
+        # Manifest v cieľovom priečinku určí, ktoré výstupy sú aktuálne a dajú sa preskočiť
+        self.manifest = TagManifest(self.selected_folder)
+        self.encoder_report = EncoderReport()
+        self.profile = profile = self.profile_dropdown.currentText()
+        recipe = badges_recipe(badges, profile)
+        force = self.force_checkbox.isChecked()
+        jobs = [(image_path, (image_path, badges, self.selected_folder, recipe,
+                              self.manifest.previous(image_path), force))
+                for image_path in self.selected_files]
+
+        # Druhý súbor s rovnakým výstupným názvom (p2.jpg a p2.png) sa nespracuje a ráta sa ako chyba
+        folder = self.selected_folder
+        dedup = claim_outputs(lambda image_path: os.path.join(folder, output_name(image_path, profile)))
+        self.worker = PoolWorker(tag_image_incremental, jobs, self.workers_spinbox.value(), self, dedup=dedup)
+        self.worker.file_done.connect(self.record_result)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.batch_finished.connect(self.processing_finished)
+
+        self.progress_bar.setValue(0)
+        self.check_ready()
+        self.button_cancel.setEnabled(True)
+        self.set_button_style(self.button_cancel, True)
+        self.worker.start()
+
+    def record_result(self, image_path, result):
+        self.manifest.record(image_path, result)
+        self.encoder_report.add(self.profile, result[3])
 
-        for image_path in self.selected_files:
-            try:
-                img = Image.open(image_path).convert("RGBA")
-                tag = Image.open(tag_path).convert("RGBA").resize((img.width // 3, img.height // 3), Image.Resampling.LANCZOS)
-                
-                x_offset = self.selected_position[1] * (img.width // 3)
-                y_offset = self.selected_position[0] * (img.height // 3)
-                
-                img.paste(tag, (x_offset, y_offset), tag)
-                
-                base_name, ext = os.path.splitext(os.path.basename(image_path))
-                new_name = f"{base_name}_TAG.jpg"
-                save_path = os.path.join(self.selected_folder, new_name)
-                img.convert("RGB").save(save_path, "JPEG")
-                
-            except Exception as e:
-                print(f"Chyba pri spracovaní obrázka {image_path}: {e}")
-                pass
-        QMessageBox.information(self, "Hotovo", "Obrázky boli upravené!")
+    def cancel_processing(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.button_cancel.setEnabled(False)
+            self.set_button_style(self.button_cancel, False)
+
+    def stop_workers(self):
+        # Vlákna musia skončiť skôr, než Qt zruší okno – inak by zrušilo bežiaci QThread
+        self.thumbnail_loader.requestInterruption()
+        self.thumbnail_loader.wait()
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+            self.manifest.save()
+
+    def closeEvent(self, event):
+        self.stop_workers()
+        super().closeEvent(event)
+
+    def update_progress(self, current, total):
+        self.progress_bar.setValue(int(current / total * 100) if total else 100)
+
+    def processing_finished(self, done, failed, cancelled):
+        self.worker.wait()
+        self.worker = None
+        self.manifest.save()
+        counts = self.manifest.counts
+        summary = f"Nové: {counts['new']}, prestavané: {counts['rebuilt']}, preskočené: {counts['skipped']}"
+        summary = "\n".join([summary] + self.encoder_report.lines())
+        self.button_cancel.setEnabled(False)
+        self.set_button_style(self.button_cancel, False)
+        self.check_ready()
+
+        if cancelled:
+            QMessageBox.information(self, "Zrušené", "Tagovanie bolo zrušené.\n" + summary)
+        elif failed:
+            QMessageBox.warning(self, "Chyba", f"Nepodarilo sa upraviť {failed} obrázkov.\n" + summary)
+        else:
+            QMessageBox.information(self, "Hotovo", "Obrázky boli upravené!\n" + summary)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MyApp()
     window.show()
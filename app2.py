@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from PyQt6.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QStackedWidget, QFileDialog, 
                              QFrame, QSizePolicy, QMessageBox, QProgressBar)
 from PyQt6.QtGui import QFont
@@ -49,12 +50,12 @@ class MainApp(QWidget):
         self.stacked_widget = QStackedWidget(self)
         self.main_menu = self.create_main_menu()
         self.download_view = self.create_download_view()
-        self.tagging_view = self.create_tagging_view()
+        self.tagger = None
+        self.tagging_view = None  # Tagovanie sa vytvorí až pri prvom otvorení
         self.normalizer_view = self.create_normalizer_view()
 
         self.stacked_widget.addWidget(self.main_menu)
         self.stacked_widget.addWidget(self.download_view)
-        self.stacked_widget.addWidget(self.tagging_view)
         self.stacked_widget.addWidget(self.normalizer_view)
         self.stacked_widget.setCurrentWidget(self.main_menu)
 
@@ -110,7 +111,7 @@ class MainApp(QWidget):
         layout.addWidget(self.button_download)
 
         self.button_tagging = self.create_button("Tagovanie Obrázkov")
-        self.button_tagging.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.tagging_view))
+        self.button_tagging.clicked.connect(self.show_tagging_view)
         layout.addWidget(self.button_tagging)
 
         self.button_normalize = self.create_button("Normalizácia Obrázkov")
@@ -121,7 +122,7 @@ class MainApp(QWidget):
 
     def create_download_view(self):
         from pic import ImageDownloaderApp
-        download_view = ImageDownloaderApp()
+        download_view = self.downloader = ImageDownloaderApp()
 
         back_button = self.create_button("Späť do menu")
         back_button.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.main_menu))
@@ -135,9 +136,15 @@ class MainApp(QWidget):
         container_widget.setLayout(layout)
         return container_widget
 
+    def show_tagging_view(self):
+        if self.tagging_view is None:
+            self.tagging_view = self.create_tagging_view()
+            self.stacked_widget.addWidget(self.tagging_view)
+        self.stacked_widget.setCurrentWidget(self.tagging_view)
+
     def create_tagging_view(self):
         from app import MyApp
-        tagging_view = MyApp()
+        tagging_view = self.tagger = MyApp()
 
         back_button = self.create_button("Späť do menu")
         back_button.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.main_menu))
@@ -155,7 +162,7 @@ class MainApp(QWidget):
         from gimp import ImageNormalizerAppWrapper
 
         wrapper = ImageNormalizerAppWrapper()
-        normalizer_view = wrapper.ImageNormalizerApp(wrapper)  # vytvoríme len GUI časť
+        normalizer_view = self.normalizer = wrapper.ImageNormalizerApp(wrapper)  # vytvoríme len GUI časť
 
         back_button = self.create_button("Späť do menu")
         back_button.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.main_menu))
@@ -169,8 +176,16 @@ class MainApp(QWidget):
         container_widget.setLayout(layout)
         return container_widget
 
+    def closeEvent(self, event):
+        # Pohľady sú vnorené, ich closeEvent sa nezavolá – vlákna zastavíme tu
+        for view in (self.downloader, self.tagger, self.normalizer):
+            if view is not None:
+                view.stop_workers()
+        super().closeEvent(event)
+
     
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainApp()
     window.show()
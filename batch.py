@@ -0,0 +1,260 @@
+import os
+import csv
+import glob
+import time
+import queue
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".ppm", ".tga")
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_atomic(path, data):
+    # Zápis cez dočasný súbor v tom istom priečinku a os.replace –
+    # prerušený zápis nikdy nepoškodí existujúci súbor
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(data)
+
+
+class OutputWriter:
+    # Výstupy zapisuje samostatné vlákno, kým pool počíta ďalšie súbory. Fronta je ohraničená,
+    # takže ak disk nestíha, koordinátor počká a v pamäti je najviac max_pending výstupov.
+    def __init__(self, max_pending=8):
+        self._queue = queue.Queue(max_pending)
+        self._finished = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            key, result = item
+            try:
+                written = write_atomic(result[0], result[1])
+                self._finished.put((key, (result[0], written) + tuple(result[2:]), None))
+            except Exception as e:
+                self._finished.put((key, None, e))
+
+    def submit(self, key, result):
+        self._queue.put((key, result))
+
+    def finished(self):
+        while True:
+            try:
+                yield self._finished.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        return list(self.finished())
+
+
+def write_results(results, max_pending=8):
+    # Medzi run_jobs a spotrebiteľom: výsledok (cesta, dáta, ...) sa odovzdá OutputWriter-u
+    # a ďalej ide ako (cesta, zapísané bajty, ...) až po dokončenom zápise
+    writer = OutputWriter(max_pending)
+    try:
+        for key, result, error in results:
+            if error is None:
+                writer.submit(key, result)
+            else:
+                yield key, result, error
+            yield from writer.finished()
+    finally:
+        remaining = writer.close()
+    yield from remaining
+
+
+def link_file(source, target):
+    # Rovnaký obsah pod ďalším menom: hardlink, ak to súborový systém dovolí, inak kópia.
+    # Cez dočasné meno a os.replace; neskorší atomický prepis jedného z mien väzbu preruší.
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return target
+    tmp_path = f"{target}.{os.getpid()}.link"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+def inode_identity(key, args=None):
+    # Hardlinkované vstupy (napr. duplicitné sťahovania) majú rovnaký inode – zistí sa bez čítania obsahu
+    try:
+        stat = os.stat(key)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino) if stat.st_nlink > 1 else None
+
+
+class Deduplicator:
+    # Úlohy s rovnakou identitou (URL, hash obsahu, inode) sa spracujú raz. Ďalšie počkajú na výsledok
+    # prvej a dostanú ho cez materialize(výsledok, kľúč, argumenty), napr. hardlinkom jej výstupu.
+    # filter() sa zaradí pred spracovanie úloh, results() za neho. Chyba prvej úlohy sa odovzdá
+    # aj ďalším; so share_errors=False dostane materialize namiesto výsledku None.
+    # Rozpracované identity sa po dokončení uvoľnia. Hotové sa pamätajú pre neskoršie duplikáty;
+    # s max_done len posledných max_done použitých (LRU) – staršia identita sa pri ďalšom výskyte
+    # spracuje znova, takže pamäť nerastie s počtom riadkov dávky.
+    def __init__(self, identity, materialize, share_errors=True, max_done=None):
+        self.identity = identity
+        self.materialize = materialize
+        self.share_errors = share_errors
+        self.max_done = max_done
+        self.duplicates = 0
+        self._primary = {}
+        self._waiting = {}
+        self._done = OrderedDict()
+        self._ready = deque()
+
+    def filter(self, jobs):
+        for key, args in jobs:
+            identity = self.identity(key, args)
+            if identity is None:
+                yield key, args
+            elif identity in self._done:
+                self._done.move_to_end(identity)
+                self._ready.append(self._follow(identity, key, args))
+            elif identity in self._waiting:
+                self._waiting[identity].append((key, args))
+            else:
+                self._waiting[identity] = []
+                self._primary[key] = identity
+                yield key, args
+
+    def _follow(self, identity, key, args):
+        self.duplicates += 1
+        result, error = self._done[identity]
+        if error is not None and self.share_errors:
+            return key, None, error
+        try:
+            return key, self.materialize(result, key, args), None
+        except Exception as e:
+            return key, None, e
+
+    def results(self, results):
+        for key, result, error in results:
+            yield key, result, error
+            identity = self._primary.pop(key, None)
+            if identity is not None:
+                self._done[identity] = (result, error)
+                for follower_key, follower_args in self._waiting.pop(identity):
+                    yield self._follow(identity, follower_key, follower_args)
+                if self.max_done is not None and len(self._done) > self.max_done:
+                    self._done.popitem(last=False)
+            while self._ready:
+                yield self._ready.popleft()
+        while self._ready:
+            yield self._ready.popleft()
+
+
+def claim_outputs(target):
+    # Deduplicator podľa cieľovej cesty target(kľúč): druhý vstup s rovnakým výstupom
+    # (foo.jpg a foo.png do jedného priečinka) sa nespracuje a skončí chybou namiesto prepisu
+    def identity(key, args):
+        try:
+            return os.path.normcase(os.path.abspath(target(key)))
+        except ValueError:
+            return None  # chybu nahlási samotná úloha
+
+    def refuse(result, key, args):
+        raise ValueError(f"Output {target(key)} belongs to another input in this run")
+
+    return Deduplicator(identity, refuse, share_errors=False)
+
+
+def default_worker_count():
+    return os.cpu_count() or 1
+
+
+def iter_inputs(specs, extensions=IMAGE_EXTENSIONS):
+    # Vstupy môžu byť súbory, glob vzory, priečinky alebo CSV so zoznamom ciest v prvom stĺpci
+    for spec in specs:
+        if os.path.isdir(spec):
+            for entry in sorted(os.scandir(spec), key=lambda e: e.name):
+                if entry.is_file() and entry.name.lower().endswith(extensions):
+                    yield entry.path
+        elif spec.lower().endswith(".csv") and os.path.isfile(spec):
+            with open(spec, "r", encoding="utf-8", newline="") as file:
+                for row in csv.reader(file):
+                    if row and row[0].lower().endswith(extensions):
+                        yield row[0]
+        elif glob.has_magic(spec):
+            yield from sorted(glob.iglob(spec, recursive=True))
+        else:
+            yield spec
+
+
+def run_jobs(func, jobs, max_workers=None, cancelled=None, paused=None):
+    # Generátor (kľúč, výsledok, chyba). Do poolu posielame len obmedzené okno úloh,
+    # takže vstupy sa čítajú priebežne a zrušenie nemusí čakať na celú dávku.
+    # Počas pauzy sa nové úlohy neposielajú, rozpracované sa dokončia.
+    # Ak pool padne (napr. OOM zabije worker), zvyšné úlohy sa nahlásia ako chybné.
+    max_workers = max_workers or default_worker_count()
+    cancelled = cancelled or (lambda: False)
+    paused = paused or (lambda: False)
+    window = max_workers * 2
+    pending = {}
+    job_iter = iter(jobs)
+    broken = None
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while not cancelled() and not paused() and len(pending) < window:
+                job = next(job_iter, None)
+                if job is None:
+                    break
+                key, args = job
+                if broken is not None:
+                    yield key, None, broken
+                    continue
+                try:
+                    pending[pool.submit(func, *args)] = key
+                except (BrokenProcessPool, RuntimeError) as e:
+                    broken = e
+                    yield key, None, e
+
+            if not pending:
+                if paused() and not cancelled():
+                    time.sleep(0.1)
+                    continue
+                break
+
+            finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = pending.pop(future)
+                try:
+                    yield key, future.result(), None
+                except Exception as e:
+                    yield key, None, e
+
+            if cancelled():
+                for future in list(pending):
+                    if future.cancel():
+                        del pending[future]
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+import PIL
+
+# Benchmark normalizéra a tagovania na syntetických produktových fotkách.
+# Beží offline, korpus sa vygeneruje raz a ďalšie behy ho použijú znova.
+# Každá fáza beží v čerstvom procese, aby špička RSS patrila len jej.
+
+DEFAULT_SIZES = (0.5, 2, 12, 50)
+QUICK_SIZES = (0.5, 2)
+VARIANTS = ("jpeg", "png", "rgba")
+EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "rgba": ".png"}
+# Zvýšiť pri zmene generátora, aby sa starý korpus nepoužil znova
+CORPUS_VERSION = 3
+
+
+def product_photo(megapixels, seed):
+    # Takmer biele pozadie s jemným šumom a prechodom, tieňovaný objekt rôznej veľkosti a tieň pod ním
+    rng = random.Random(seed)
+    aspect = rng.uniform(0.75, 1.33)
+    width = int((megapixels * 1e6 * aspect) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+
+    # Šum a prechod sú rovnaké vo všetkých kanáloch a orezané na hodnoty bg a bg + 1, takže aj s chybou
+    # JPEG ostanú pod prahom pozadia normalizéra – inak by autocrop bral celé plátno ako objekt
+    bg = rng.randint(243, 251)
+    small = np.random.default_rng(seed).normal(bg + 1, 0.4, (max(2, height // 64), max(2, width // 64), 1))
+    small = np.clip(small + np.linspace(-0.8, 0.8, small.shape[0])[:, None, None], bg, bg + 1.99)
+    background = Image.fromarray(np.repeat(small, 3, axis=2).astype(np.uint8)).resize((width, height), Image.Resampling.BILINEAR)
+
+    fill = rng.uniform(0.15, 0.9)
+    obj_w, obj_h = max(8, int(width * fill * rng.uniform(0.6, 1))), max(8, int(height * fill * rng.uniform(0.6, 1)))
+    left = rng.randint(0, width - obj_w)
+    top = rng.randint(0, height - obj_h)
+
+    # Objekt sa kreslí v malom rozlíšení a zväčší sa – rýchle aj pri 50 MP
+    scale = max(1, max(obj_w, obj_h) // 512)
+    shape = Image.new("L", (max(1, obj_w // scale), max(1, obj_h // scale)), 0)
+    draw = ImageDraw.Draw(shape)
+    if rng.random() < 0.5:
+        draw.rounded_rectangle((0, 0, shape.width - 1, shape.height - 1), radius=shape.width // 8, fill=255)
+    else:
+        draw.ellipse((0, 0, shape.width - 1, shape.height - 1), fill=255)
+    mask = shape.resize((obj_w, obj_h), Image.Resampling.BILINEAR)
+
+    color = np.array([rng.randint(20, 220) for _ in range(3)], dtype=np.float32)
+    shading = np.linspace(0.7, 1.15, max(1, obj_h // scale))[:, None, None] * color
+    body = Image.fromarray(np.clip(np.repeat(shading, max(1, obj_w // scale), axis=1), 0, 255).astype(np.uint8))
+    body = body.resize((obj_w, obj_h), Image.Resampling.BILINEAR)
+
+    shadow = mask.point(lambda v: v * 40 // 255).filter(ImageFilter.BoxBlur(2))
+    background.paste((0, 0, 0), (left + obj_w // 40, top + obj_h // 40), shadow)
+    background.paste(body, (left, top), mask)
+    return background, mask, (left, top)
+
+
+def write_variant(image, mask, offset, variant, path):
+    if variant == "jpeg":
+        image.save(path, "JPEG", quality=90)
+    elif variant == "png":
+        image.save(path, "PNG", compress_level=1)
+    else:
+        # Vystrihnutý produkt s priehľadným pozadím
+        alpha = Image.new("L", image.size, 0)
+        alpha.paste(mask, offset)
+        rgba = image.convert("RGBA")
+        rgba.putalpha(alpha)
+        rgba.save(path, "PNG", compress_level=1)
+
+
+def check_crop(path, mask, offset, margin=16):
+    # Autocrop musí nájsť objekt s tieňom, nie celé plátno – inak by fázy merali nesprávnu cestu
+    from normalizer import find_foreground_bbox
+    left, top = offset
+    limit = (left - margin, top - margin, left + mask.width * 41 // 40 + margin, top + mask.height * 41 // 40 + margin)
+    with Image.open(path) as image:
+        box = find_foreground_bbox(image.convert("RGB"))
+    if box is None or box[0] < limit[0] or box[1] < limit[1] or box[2] > limit[2] or box[3] > limit[3]:
+        os.remove(path)
+        raise RuntimeError(f"{path}: autocrop box {box} exceeds the product {limit}, background is too noisy")
+
+
+def build_corpus(folder, sizes, count, variants=VARIANTS):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for megapixels in sizes:
+        for index in range(count):
+            seed = int(megapixels * 1000) * 100 + index
+            image = mask = offset = None
+            for variant in variants:
+                path = os.path.join(folder, f"product_v{CORPUS_VERSION}_{megapixels:g}mp_{index}_{variant}{EXTENSIONS[variant]}")
+                if not os.path.exists(path):
+                    if image is None:
+                        image, mask, offset = product_photo(megapixels, seed)
+                    write_variant(image, mask, offset, variant, path + ".tmp")
+                    check_crop(path + ".tmp", mask, offset)
+                    os.replace(path + ".tmp", path)
+                paths.append(path)
+
+    badge = os.path.join(folder, "badge.png")
+    if not os.path.exists(badge):
+        tag = Image.new("RGBA", (400, 400), (0, 0, 0, 0))
+        ImageDraw.Draw(tag).ellipse((20, 20, 380, 380), fill=(233, 30, 99, 230))
+        tag.save(badge, "PNG")
+    return paths, badge
+
+
+def stage_decode(path, out_dir, badge):
+    with Image.open(path) as image:
+        image.convert("RGB")
+
+
+def stage_autocrop(path, out_dir, badge):
+    from normalizer import smart_autocrop
+    with Image.open(path) as image:
+        smart_autocrop(image.convert("RGB"))
+
+
+def normalize_stage(**options):
+    def stage(path, out_dir, badge):
+        from normalizer import render_file
+        render_file(path, output_dir=out_dir, **options)
+    return stage
+
+
+def stage_tag(path, out_dir, badge):
+    from tagging import tag_image
+    tag_image(path, [(badge, (2, 0))], out_dir)
+
+
+STAGES = {
+    "decode": stage_decode,
+    "autocrop": stage_autocrop,
+    "normalize": normalize_stage(),
+    "normalize-proxy": normalize_stage(proxy=True),
+    "normalize-strip": normalize_stage(memory_limit=64 * 1024 * 1024),
+    "tag": stage_tag,
+}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_stage(name, paths, badge, repeat):
+    # Beží v samostatnom procese; base_rss_mb je špička po importoch, pred prvým obrázkom
+    import normalizer, tagging  # noqa: F401
+    base_rss = peak_rss_mb()
+    megapixels = 0
+    for path in paths:
+        with Image.open(path) as image:
+            megapixels += image.width * image.height / 1e6
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for path in paths:
+                STAGES[name](path, out_dir, badge)
+        seconds = time.perf_counter() - start
+
+    images = len(paths) * repeat
+    return {
+        "images": images,
+        "megapixels": round(megapixels * repeat, 2),
+        "seconds": round(seconds, 3),
+        "images_per_sec": round(images / seconds, 3),
+        "mp_per_sec": round(megapixels * repeat / seconds, 2),
+        "base_rss_mb": base_rss and round(base_rss, 1),
+        "peak_rss_mb": base_rss and round(peak_rss_mb(), 1),
+    }
+
+
+def run_suite(paths, badge, stages, repeat):
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(run_stage, name, paths, badge, repeat).result()
+        print(format_line(name, results[name]))
+    return results
+
+
+def format_line(name, result, baseline=None):
+    line = (f"{name:16} {result['images_per_sec']:8.2f} img/s {result['mp_per_sec']:8.1f} MP/s"
+            f" {result['peak_rss_mb'] or 0:8.0f} MB peak")
+    if baseline:
+        speed = result["mp_per_sec"] / baseline["mp_per_sec"] - 1
+        line += f"   {speed:+.1%} speed"
+        if result["peak_rss_mb"] and baseline.get("peak_rss_mb"):
+            line += f", {result['peak_rss_mb'] - baseline['peak_rss_mb']:+.0f} MB peak"
+    return line
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark normalize and tag stages on a synthetic product-photo corpus.")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "imgops_bench_corpus"),
+                        help="folder for the generated corpus (reused between runs)")
+    parser.add_argument("--sizes", type=lambda v: [float(s) for s in v.split(",")],
+                        help=f"image sizes in megapixels (default: {','.join(f'{s:g}' for s in DEFAULT_SIZES)})")
+    parser.add_argument("--quick", action="store_true", help=f"only {','.join(f'{s:g}' for s in QUICK_SIZES)} MP images")
+    parser.add_argument("--count", type=int, default=2, help="images per size and variant (default: 2)")
+    parser.add_argument("--variants", type=lambda v: v.split(","), default=list(VARIANTS),
+                        help=f"comma separated subset of {','.join(VARIANTS)}")
+    parser.add_argument("--stages", type=lambda v: v.split(","), default=list(STAGES),
+                        help=f"comma separated subset of {','.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--save", metavar="FILE", help="store results as JSON (e.g. a baseline)")
+    parser.add_argument("--compare", metavar="FILE", help="compare with results stored by --save")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.stages if name not in STAGES] + [v for v in args.variants if v not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown stage or variant: {', '.join(unknown)}")
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+
+    print(f"Generating corpus in {args.corpus} ...")
+    paths, badge = build_corpus(args.corpus, sizes, args.count, args.variants)
+    print(f"{len(paths)} images, sizes {', '.join(f'{s:g}' for s in sizes)} MP, variants {', '.join(args.variants)}")
+
+    results = run_suite(paths, badge, args.stages, args.repeat)
+    summary = {"environment": environment(), "sizes": list(sizes), "count": args.count,
+               "variants": args.variants, "repeat": args.repeat, "stages": results}
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if (baseline["sizes"], baseline["count"], baseline["variants"]) != (summary["sizes"], args.count, args.variants):
+            print("Warning: the baseline was measured on a different corpus", file=sys.stderr)
+        print(f"\nCompared with {args.compare}:")
+        for name, result in results.items():
+            print(format_line(name, result, baseline["stages"].get(name)))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2, sort_keys=True)
+        print(f"Results saved to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import math
+from contextlib import contextmanager
+from PIL import Image, ImageFile
+from imaging import load_rgb
+
+
+@contextmanager
+def unbounded_pixels():
+    # Pásový režim je určený práve pre obrovské packshoty – kontrola "decompression bomb" by ich odmietla
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def raw_bits_per_pixel(mode, rawmode):
+    # Koľko bitov na pixel číta raw dekóder – zistíme to dekódovaním jedného riadku 8 pixelov
+    for count in range(1, 8 * 16 + 1):
+        decoder = Image._getdecoder(mode, "raw", (rawmode, 0, 1))
+        decoder.setimage(Image.core.new(mode, (8, 1)), (0, 0, 8, 1))
+        if decoder.decode(b"\0" * count)[0] < 0:
+            return count
+    raise ValueError(f"Unsupported raw mode {rawmode}")
+
+
+class BandReader:
+    # Číta obrázok po horizontálnych pásoch. Nekomprimované formáty (TIFF, BMP, PPM, TGA)
+    # sa dekódujú len v rozsahu pásu priamo zo súboru; ostatné (PNG, komprimovaný TIFF, WebP)
+    # Pillow vie dekódovať len celé, vtedy sa obrázok načíta raz a pásy sa z neho orezávajú.
+    # JPEG sa dekóduje draftom v menšej mierke, ak výstup plné rozlíšenie nepotrebuje.
+    # Čítanie pásov používa interné API Pillow; ak ho iná verzia zmení, obrázok sa dekóduje celý.
+    def __init__(self, image_path, min_size=None):
+        self.image_path = image_path
+        with unbounded_pixels():
+            image = Image.open(image_path)
+        self.full_size = image.size
+        if min_size and image.format == 'JPEG':
+            # draft zachová aspoň min_size, takže výstup stále vzniká zmenšením
+            image.draft('RGB', min_size)
+        self.image = image
+        self.size = image.size
+        self.mode = image.mode
+        try:
+            self.tiles = self._raw_tiles(image)
+        except (AttributeError, TypeError, ValueError):
+            self.tiles = None
+        self._decoded = None
+
+    def _raw_tiles(self, image):
+        if image.format == 'JPEG' or not image.tile:
+            return None
+        tiles = []
+        for tile in image.tile:
+            args = tile.args if isinstance(tile.args, tuple) else (tile.args,)
+            if tile.codec_name != "raw" or len(args) > 3:
+                return None
+            rawmode = args[0]
+            stride = args[1] if len(args) > 1 else 0
+            orientation = args[2] if len(args) > 2 else 1
+            x0, y0, x1, y1 = tile.extents
+            if not stride:
+                stride = ((x1 - x0) * raw_bits_per_pixel(image.mode, rawmode) + 7) // 8
+            tiles.append((tile.extents, tile.offset, rawmode, stride, orientation))
+        return tiles
+
+    def read(self, y0, y1):
+        # Riadky [y0, y1) celej šírky, RGB (priehľadnosť sa skladá na bielu ako v normalizéri)
+        band = None
+        if self.tiles is not None:
+            try:
+                band = self._read_raw(y0, y1)
+            except (AttributeError, TypeError):
+                self.tiles = None
+        if band is None:
+            if self._decoded is None:
+                with unbounded_pixels():
+                    self.image.load()
+                self._decoded = self.image
+            band = self._decoded.crop((0, y0, self.size[0], y1))
+
+        return load_rgb(band)
+
+    def _read_raw(self, y0, y1):
+        tiles = []
+        for (tx0, ty0, tx1, ty1), offset, rawmode, stride, orientation in self.tiles:
+            r0, r1 = max(ty0, y0), min(ty1, y1)
+            if r0 >= r1:
+                continue
+            # Zdola nahor uložené riadky (BMP, TGA) majú posun počítaný od spodku dlaždice
+            skip = r0 - ty0 if orientation > 0 else ty1 - r1
+            tiles.append(ImageFile._Tile("raw", (tx0, r0 - y0, tx1, r1 - y0),
+                                         offset + skip * stride, (rawmode, stride, orientation)))
+
+        with unbounded_pixels():
+            band = Image.open(self.image_path)
+        band._size = (self.size[0], y1 - y0)
+        if hasattr(band, "_tile_size"):
+            # TIFF alokuje plátno podľa _tile_size, nie podľa size
+            band._tile_size = band._size
+        band.tile = tiles
+        band.load()
+        return band
+
+    def close(self):
+        self.image.close()
+        self._decoded = None
+
+
+def band_rows(width, memory_limit, bytes_per_pixel=24):
+    # Výška pásu tak, aby pás aj s dočasnými poľami (RGB, int16 maska) zostal pod limitom
+    return max(16, memory_limit // max(1, width * bytes_per_pixel))
+
+
+def lanczos_margin(scale):
+    # LANCZOS pri zmenšení siaha 3 × mierka zdrojových pixelov na každú stranu
+    return math.ceil(3 * max(scale, 1)) + 2
@@ -0,0 +1,501 @@
+import io
+import os
+import csv
+import json
+import codecs
+import time
+import random
+import hashlib
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from batch import Deduplicator, file_hash, link_file
+from formats import check_head, prepare_image
+
+# Sťahovanie čaká hlavne na sieť, preto vlákna a viac súbežných spojení, než je jadier
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+DEFAULT_RETRIES = 3
+DEFAULT_PER_HOST = 4
+# Koľko naposledy použitých URL a hashov obsahu si beh pamätá na zlúčenie duplikátov (pamäť je tak
+# ohraničená aj pri miliónových CSV); staršie opakovanie sa stiahne znova
+DEDUP_WINDOW = 100 * 1000
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRY_DELAY = 120
+
+
+class DownloadError(requests.exceptions.RequestException):
+    pass
+
+
+class IncompleteDownload(DownloadError):
+    pass
+
+
+EAN_COLUMNS = ("ean", "gtin", "barcode", "kod", "kód", "code")
+URL_COLUMNS = ("url", "image", "img", "obrazok", "obrázok", "foto", "photo", "link")
+
+
+def detect_encoding(sample):
+    # BOM rozhodne hneď; bez neho UTF-8, a ak sa vzorka nedá dekódovať, Windows export v cp1250
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1250"
+
+
+def detect_columns(first, second):
+    # Vracia (má hlavičku, stĺpec EAN, stĺpec URL) podľa názvov v hlavičke alebo podľa hodnôt http(s)://
+    def find(cells, names):
+        return next((i for i, cell in enumerate(cells) if any(name in cell for name in names)), None)
+
+    def url_cell(row):
+        return next((i for i, cell in enumerate(row) if cell.strip().lower().startswith(("http://", "https://"))), None)
+
+    # Prvý riadok s URL je dáta, aj keď URL obsahuje "img" či "url" – hlavička URL nikdy nemá
+    url_column = url_cell(first)
+    if url_column is not None:
+        return False, int(url_column == 0), url_column
+
+    header = [cell.strip().lower() for cell in first]
+    url_column = find(header, URL_COLUMNS)
+    if url_column is not None:
+        ean_column = find([cell if i != url_column else "" for i, cell in enumerate(header)], EAN_COLUMNS)
+        return True, ean_column if ean_column is not None else int(url_column == 0), url_column
+
+    url_column = url_cell(second)
+    if url_column is None:
+        url_column = 1
+    return True, int(url_column == 0), url_column
+
+
+class CsvRows:
+    # Číta EAN/URL riadky priebežne, bez načítania celého súboru. Kódovanie, oddeľovač a stĺpce
+    # sa zistia zo začiatku súboru; bytes_read / total_bytes slúžia na priebeh podľa prečítaných bajtov.
+    def __init__(self, csv_file, sample_size=64 * 1024):
+        self.csv_file = csv_file
+        self.total_bytes = os.path.getsize(csv_file)
+        self.bytes_read = 0
+        with open(csv_file, "rb") as file:
+            sample = file.read(sample_size)
+        self.encoding = detect_encoding(sample)
+        lines = sample.decode(self.encoding, errors="ignore").splitlines()[:20]
+        try:
+            self.dialect = csv.Sniffer().sniff("\n".join(lines), delimiters=",;\t|")
+        except csv.Error:
+            self.dialect = csv.excel
+        first, second = (list(csv.reader(lines[:2], self.dialect)) + [[], []])[:2]
+        self.has_header, self.ean_column, self.url_column = detect_columns(first, second)
+
+    def __iter__(self):
+        needed = max(self.ean_column, self.url_column)
+        with open(self.csv_file, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding=self.encoding, errors="replace", newline="")
+            reader = csv.reader(text, self.dialect)
+            if self.has_header:
+                next(reader, None)
+            for row in reader:
+                self.bytes_read = raw.tell()
+                if len(row) <= needed:
+                    continue
+                ean, img_url = row[self.ean_column].strip(), row[self.url_column].strip()
+                if ean and img_url:
+                    yield ean, img_url
+        self.bytes_read = self.total_bytes
+
+
+def iter_csv_rows(csv_file):
+    # Riadky bez EAN alebo URL preskakujeme
+    yield from CsvRows(csv_file)
+
+
+def make_session(max_workers=DEFAULT_DOWNLOAD_WORKERS):
+    # Jedna session pre celú dávku: keep-alive a pool spojení pre každý host,
+    # každé vlákno môže mať k tomu istému CDN vlastné otvorené spojenie
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+MANIFEST_NAME = ".imgops_downloads.json"
+
+
+class DownloadManifest:
+    # Manifest v cieľovom priečinku: pre každý EAN URL, ETag, Last-Modified, veľkosť a hash súboru.
+    # Pri ďalšom behu sa posielajú podmienené požiadavky, odpoveď 304 súbor nemení.
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.entries = {}
+        self.counts = {"new": 0, "updated": 0, "unchanged": 0, "skipped": 0, "transcoded": 0, "linked": 0}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    def previous(self, ean):
+        return self.entries.get(ean)
+
+    def record(self, ean, result, linked=False):
+        # linked: súbor je hardlink obrázka iného EAN (rovnaká URL alebo rovnaký obsah)
+        status, img_path, entry = result
+        self.entries[ean] = entry
+        self.counts[status] += 1
+        if status in ("new", "updated"):
+            if linked:
+                self.counts["linked"] += 1
+            elif entry.get("action") == "transcoded":
+                self.counts["transcoded"] += 1
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def file_intact(img_path, entry):
+    # Súbor zodpovedá manifestu: rovnaká veľkosť a mtime, pri inom mtime rozhodne hash
+    try:
+        stat = os.stat(img_path)
+    except OSError:
+        return False
+    if stat.st_size != entry.get("bytes"):
+        return False
+    return stat.st_mtime_ns == entry.get("mtime_ns") or file_hash(img_path) == entry.get("sha256")
+
+
+def iter_body(response, img_url, max_bytes=DEFAULT_MAX_BYTES):
+    # Telo odpovede po kúskoch, s kontrolou limitu veľkosti a Content-Length
+    length = response.headers.get("Content-Length", "")
+    expected = int(length) if length.isdigit() else None
+    if max_bytes and expected is not None and expected > max_bytes:
+        raise DownloadError(f"{img_url} has {expected} bytes, over the {max_bytes} byte limit")
+    # Pri kompresii prenosu (gzip) Content-Length nezodpovedá dekódovaným bajtom
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        expected = None
+
+    received = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        received += len(chunk)
+        if max_bytes and received > max_bytes:
+            raise DownloadError(f"{img_url} is over the {max_bytes} byte limit")
+        yield chunk
+    if expected is not None and received != expected:
+        raise IncompleteDownload(f"{img_url} was truncated ({received} of {expected} bytes)")
+
+
+def stored_copy(ean, img_url, target_folder, previous):
+    # Cesta k neporušenému súboru z predchádzajúceho behu pre tú istú URL, inak None
+    img_path = os.path.join(target_folder, f"{ean}.jpg")
+    if previous and previous.get("url") == img_url and file_intact(img_path, previous):
+        return img_path
+    return None
+
+
+def fetch_image(ean, img_url, target_folder, timeout=10, session=None, max_bytes=DEFAULT_MAX_BYTES,
+                previous=None, skip_unchanged=False):
+    # Vracia (stav, cesta, záznam do manifestu); stav je "new", "updated", "unchanged" (304 alebo
+    # rovnaký hash obsahu) alebo "skipped".
+    # Telo sa po kúskoch zapisuje do dočasného .part súboru, v pamäti je vždy len jeden kúsok.
+    # Pod menom <ean>.jpg sa objaví až úplne stiahnutý a overený JPEG; pri chybe sa .part zmaže.
+    # Formát sa zisťuje z magického čísla: platný JPEG ostáva bajt po bajte, ostatné sa raz prekódujú.
+    img_path = os.path.join(target_folder, f"{ean}.jpg")
+    headers = {}
+    stored = stored_copy(ean, img_url, target_folder, previous)
+    if stored:
+        if skip_unchanged:
+            return "skipped", img_path, previous
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    with (session or requests).get(img_url, timeout=timeout, stream=True, headers=headers) as response:
+        if response.status_code == 304 and headers:
+            return "unchanged", img_path, previous
+        response.raise_for_status()
+
+        tmp_path = f"{img_path}.{os.getpid()}.{threading.get_ident()}.part"
+        digest = hashlib.sha256()
+        try:
+            written = 0
+            with open(tmp_path, "wb") as img_file:
+                for chunk in iter_body(response, img_url, max_bytes):
+                    if not written:
+                        check_head(chunk, img_url)
+                    written += len(chunk)
+                    img_file.write(chunk)
+                    digest.update(chunk)
+                img_file.flush()
+                os.fsync(img_file.fileno())
+            if not written:
+                check_head(b"", img_url)
+            image_format, action = prepare_image(tmp_path)
+            if action == "transcoded":
+                written, digest = os.path.getsize(tmp_path), hashlib.sha256()
+                with open(tmp_path, "rb") as img_file:
+                    for chunk in iter(lambda: img_file.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+            if stored and digest.hexdigest() == previous.get("sha256"):
+                # Server bez ETag/Last-Modified poslal ten istý obsah – uložený súbor ostáva bez zmeny
+                os.remove(tmp_path)
+                return "unchanged", img_path, previous
+            os.replace(tmp_path, img_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        entry = {
+            "url": img_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "format": image_format,
+            "action": action,
+            "bytes": written,
+            "sha256": digest.hexdigest(),
+            "mtime_ns": os.stat(img_path).st_mtime_ns,
+        }
+    return ("updated" if previous else "new"), img_path, entry
+
+
+def fetch_bytes(ean, img_url, target_folder=None, timeout=10, session=None, max_bytes=DEFAULT_MAX_BYTES,
+                previous=None, skip_unchanged=False):
+    # Rovnaké argumenty ako fetch_image, ale telo vráti v pamäti (pre pipeline bez medzisúborov)
+    with (session or requests).get(img_url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        data = bytearray()
+        for chunk in iter_body(response, img_url, max_bytes):
+            if not data:
+                check_head(chunk, img_url)
+            data += chunk
+    if not data:
+        check_head(b"", img_url)
+    return bytes(data)
+
+
+class HostLimiter:
+    # Obmedzenie pre každý host: najviac per_host súbežných požiadaviek a najviac rate požiadaviek
+    # za sekundu. Retry-After od servera posunie ďalší povolený štart pre všetky vlákna naraz.
+    def __init__(self, per_host=DEFAULT_PER_HOST, rate=None):
+        self.per_host = per_host
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def acquire(self, host, cancelled=None):
+        # Vracia False, ak sa počas čakania (aj na Retry-After) beh zrušil; slot je vtedy uvoľnený
+        cancelled = cancelled or (lambda: False)
+        with self._lock:
+            slot = self._slots.setdefault(host, threading.Semaphore(self.per_host))
+        while not slot.acquire(timeout=0.1):
+            if cancelled():
+                return False
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+        while time.monotonic() < start:
+            if cancelled():
+                slot.release()
+                return False
+            time.sleep(min(0.1, max(0, start - time.monotonic())))
+        return True
+
+    def release(self, host):
+        self._slots[host].release()
+
+    def delay(self, host, seconds):
+        with self._lock:
+            self._next_start[host] = max(self._next_start.get(host, 0), time.monotonic() + seconds)
+
+
+def retry_after(error):
+    # Retry-After je počet sekúnd alebo HTTP dátum
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    if isinstance(error, DownloadError):
+        return isinstance(error, IncompleteDownload)
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError))
+
+
+def fetch_with_retry(ean, img_url, target_folder, timeout=10, session=None, max_bytes=DEFAULT_MAX_BYTES,
+                     previous=None, skip_unchanged=False, limiter=None, retries=DEFAULT_RETRIES, cancelled=None,
+                     fetch=fetch_image):
+    # Prechodné chyby (timeout, spojenie, 429/5xx, useknuté telo) sa opakujú s exponenciálnym
+    # čakaním a náhodným rozptylom (full jitter), Retry-After má prednosť
+    # Riadok preskočený cez skip_unchanged nejde na sieť, takže nezaberá slot ani limit rate
+    if skip_unchanged and fetch is fetch_image and stored_copy(ean, img_url, target_folder, previous):
+        return fetch(ean, img_url, target_folder, timeout, session, max_bytes, previous, skip_unchanged)
+    limiter = limiter or HostLimiter()
+    cancelled = cancelled or (lambda: False)
+    host = urlsplit(img_url).netloc
+    attempt = 0
+    while True:
+        if not limiter.acquire(host, cancelled):
+            raise DownloadError(f"{img_url} cancelled")
+        try:
+            return fetch(ean, img_url, target_folder, timeout, session, max_bytes, previous, skip_unchanged)
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = retry_after(e)
+        finally:
+            limiter.release(host)
+
+        if delay is not None:
+            limiter.delay(host, min(delay, MAX_RETRY_DELAY))
+        else:
+            deadline = time.monotonic() + random.uniform(0, min(MAX_RETRY_DELAY, 2 ** attempt))
+            while time.monotonic() < deadline and not cancelled():
+                time.sleep(0.1)
+        if cancelled():
+            raise DownloadError(f"{img_url} cancelled before retry")
+        attempt += 1
+
+
+def write_failed_csv(csv_path, failed):
+    # Riadky (ean, url, chyba) v rovnakom tvare ako vstup, dajú sa rovno znova stiahnuť
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["EAN", "URL", "Error"])
+        writer.writerows(failed)
+    os.replace(tmp_path, csv_path)
+
+
+def download_image(ean, img_url, target_folder, timeout=10, session=None, max_bytes=DEFAULT_MAX_BYTES):
+    return fetch_image(ean, img_url, target_folder, timeout, session, max_bytes)[1]
+
+
+def fetch_rows(rows, target_folder, max_workers=DEFAULT_DOWNLOAD_WORKERS, timeout=10, cancelled=None, paused=None,
+               max_bytes=DEFAULT_MAX_BYTES, manifest=None, skip_unchanged=False, retries=DEFAULT_RETRIES,
+               per_host=DEFAULT_PER_HOST, rate=None, fetch=fetch_image):
+    # Generátor ((ean, url), výsledok fetch, chyba) ako batch.run_jobs, ale vo vláknach so zdieľanou session.
+    # Riadky sa čítajú priebežne, v behu je najviac okno 2 × max_workers sťahovaní.
+    cancelled = cancelled or (lambda: False)
+    paused = paused or (lambda: False)
+    window = max_workers * 2
+    pending = {}
+    row_iter = iter(rows)
+    limiter = HostLimiter(per_host, rate)
+
+    with make_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while not cancelled() and not paused() and len(pending) < window:
+                row = next(row_iter, None)
+                if row is None:
+                    break
+                ean, img_url = row
+                previous = manifest.previous(ean) if manifest else None
+                future = pool.submit(fetch_with_retry, ean, img_url, target_folder, timeout, session, max_bytes,
+                                     previous, skip_unchanged, limiter, retries, cancelled, fetch)
+                pending[future] = (ean, img_url)
+
+            if not pending:
+                if paused() and not cancelled():
+                    time.sleep(0.1)
+                    continue
+                break
+
+            finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = pending.pop(future)
+                try:
+                    yield key, future.result(), None
+                except Exception as e:
+                    yield key, None, e
+
+            if cancelled():
+                for future in list(pending):
+                    if future.cancel():
+                        del pending[future]
+
+
+def run_downloads(rows, target_folder, max_workers=DEFAULT_DOWNLOAD_WORKERS, timeout=10, cancelled=None, paused=None,
+                  max_bytes=DEFAULT_MAX_BYTES, manifest=None, skip_unchanged=False, retries=DEFAULT_RETRIES,
+                  per_host=DEFAULT_PER_HOST, rate=None, into_memory=False):
+    # Generátor ((ean, url), (stav, cesta), chyba). S into_memory sa nič nezapisuje a výsledkom sú bajty.
+    # Každá URL sa v behu sťahuje raz, ďalšie EAN s tou istou URL dostanú hardlink (alebo kópiu);
+    # rovnaký obsah z rôznych URL sa na disku tiež zlúči do hardlinkov.
+    # Manifest číta a zapisuje len toto (koordinujúce) vlákno; uložiť ho je na volajúcom.
+    options = (max_workers, timeout, cancelled, paused, max_bytes, manifest, skip_unchanged, retries, per_host, rate)
+    if into_memory:
+        yield from fetch_rows(rows, target_folder, *options, fetch=fetch_bytes)
+        return
+
+    by_hash = OrderedDict()
+
+    def share_content(result):
+        # Vracia True, ak sa súbor nahradil hardlinkom skôr stiahnutého rovnakého obsahu
+        status, img_path, entry = result
+        if status not in ("new", "updated"):
+            return False
+        first = by_hash.setdefault(entry["sha256"], img_path)
+        by_hash.move_to_end(entry["sha256"])
+        if len(by_hash) > DEDUP_WINDOW:
+            by_hash.popitem(last=False)
+        if first == img_path or not os.path.exists(first):
+            return False
+        link_file(first, img_path)
+        entry["mtime_ns"] = os.stat(img_path).st_mtime_ns
+        return True
+
+    def stored(results):
+        for key, result, error in results:
+            if error is None:
+                linked = share_content(result)
+                if manifest:
+                    manifest.record(key[0], result, linked)
+            yield key, result, error
+
+    def materialize(result, key, args):
+        status, source_path, entry = result
+        ean = key[0]
+        img_path = os.path.join(target_folder, f"{ean}.jpg")
+        previous = manifest.previous(ean) if manifest else None
+        if previous and previous.get("sha256") == entry["sha256"] and file_intact(img_path, previous):
+            result = ("unchanged", img_path, previous)
+        else:
+            link_file(source_path, img_path)
+            entry = dict(entry, mtime_ns=os.stat(img_path).st_mtime_ns)
+            result = ("updated" if previous else "new", img_path, entry)
+        if manifest:
+            manifest.record(ean, result, linked=True)
+        return result
+
+    dedup = Deduplicator(lambda key, args: key[1], materialize, max_done=DEDUP_WINDOW)
+    jobs = dedup.filter(((ean, img_url), None) for ean, img_url in rows)
+    results = fetch_rows((key for key, args in jobs), target_folder, *options)
+    for key, result, error in dedup.results(stored(results)):
+        yield key, (result[:2] if error is None else None), error
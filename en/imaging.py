@@ -0,0 +1,14 @@
+from PIL import Image
+
+
+def load_rgb(image):
+    # RGB bez zbytočnej kópie; priehľadnosť (RGBA, LA, PA, P s transparency) sa skladá na bielu
+    if image.mode in ('LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+    if image.mode == 'RGBA':
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        background.paste(image, (0, 0), image)
+        return background.convert('RGB')
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
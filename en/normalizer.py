@@ -0,0 +1,489 @@
+import os
+import json
+import math
+from PIL import Image
+import numpy as np
+from encoders import DEFAULT_PROFILE, encode_image, extension, has_extension
+from bands import BandReader, band_rows, lanczos_margin
+from batch import file_hash, write_atomic
+from imaging import load_rgb
+
+INDEX_NAME = ".imgops_analysis.jsonl"
+# Výstupy normalize vedľa zdrojov (iná prípona alebo suffix) – ďalší beh ich neberie ako zdroje
+OUTPUTS_NAME = ".imgops_outputs.jsonl"
+
+
+def background_sum(image):
+    # Súčet štyroch rohov (4 × priemer) – porovnávame v celých číslach, bez float64 kópie obrázka
+    w, h = image.size
+    corners = [image.getpixel(xy) for xy in ((0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1))]
+    return np.array([sum(channel) for channel in zip(*corners)], dtype=np.int16)
+
+
+def foreground_mask(image, box, bg_sum, bg_threshold=10):
+    # |4*pixel - súčet rohov| sčítané cez kanály > 4*prah je to isté ako pôvodné |pixel - priemer| > prah
+    block = np.asarray(image.crop(box), dtype=np.int16)
+    block *= 4
+    block -= bg_sum
+    np.abs(block, out=block)
+    return block.sum(axis=2, dtype=np.int16) > 4 * bg_threshold
+
+
+def find_foreground_bbox(image, bg_threshold=10, strip=64):
+    # Hranice hľadáme od okrajov dovnútra po pásoch, takže naraz je v pamäti len jeden pás.
+    # RGB obrázok sa nekopíruje – convert('RGB') by urobil celú kópiu aj bez zmeny režimu.
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    w, h = image.size
+    bg_sum = background_sum(image)
+
+    def rows(y0, y1):
+        return foreground_mask(image, (0, y0, w, y1), bg_sum, bg_threshold).any(axis=1)
+
+    top = None
+    for y0 in range(0, h, strip):
+        found = rows(y0, min(y0 + strip, h))
+        if found.any():
+            top = y0 + int(found.argmax())
+            break
+    if top is None:
+        return None
+
+    for y1 in range(h, top, -strip):
+        y0 = max(y1 - strip, top)
+        found = rows(y0, y1)
+        if found.any():
+            bottom = y0 + len(found) - int(found[::-1].argmax())
+            break
+
+    def cols(x0, x1):
+        return foreground_mask(image, (x0, top, x1, bottom), bg_sum, bg_threshold).any(axis=0)
+
+    for x0 in range(0, w, strip):
+        found = cols(x0, min(x0 + strip, w))
+        if found.any():
+            left = x0 + int(found.argmax())
+            break
+
+    for x1 in range(w, left, -strip):
+        x0 = max(x1 - strip, left)
+        found = cols(x0, x1)
+        if found.any():
+            right = x0 + len(found) - int(found[::-1].argmax())
+            break
+
+    return (left, top, right, bottom)
+
+
+def describe_analysis(size, bg_sum, box, bg_threshold=10):
+    # Záznam analýzy v súradniciach plného rozlíšenia
+    return {
+        "size": list(size),
+        "bg": [int(v) / 4 for v in bg_sum],
+        "bbox": list(box) if box else None,
+        "threshold": bg_threshold,
+    }
+
+
+def scale_box(box, from_size, to_size):
+    sx, sy = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    return (int(box[0] * sx), int(box[1] * sy),
+            min(to_size[0], math.ceil(box[2] * sx)), min(to_size[1], math.ceil(box[3] * sy)))
+
+
+def smart_autocrop(image, bg_threshold=10):
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    box = find_foreground_bbox(image, bg_threshold)
+    if box is None:
+        return image
+    return image.crop(box)
+
+
+def refine_bbox(image, approx_box, margin, bg_threshold=10):
+    # Spresnenie hrubého boxu z náhľadu – skenujú sa len tenké pásy okolo jeho hrán.
+    # Ak v pásoch nič nie je, alebo popredie siaha až po vonkajší okraj pásu (a pokračuje
+    # za ním, napr. jemná linka, ktorú náhľad nevidel), náhľad sa mýlil a prejde sa celý obrázok.
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    w, h = image.size
+    bg_sum = background_sum(image)
+    l, t, r, b = approx_box
+    xl, xr = max(0, l - margin), min(w, r + margin)
+    yt, yb = max(0, t - margin), min(h, b + margin)
+
+    def band(box):
+        return foreground_mask(image, box, bg_sum, bg_threshold)
+
+    top_rows = band((xl, yt, xr, min(h, t + margin))).any(axis=1)
+    bottom_y = max(0, b - margin)
+    bottom_rows = band((xl, bottom_y, xr, yb)).any(axis=1)
+    if not top_rows.any() or not bottom_rows.any() or (top_rows[0] and yt > 0) or (bottom_rows[-1] and yb < h):
+        return find_foreground_bbox(image, bg_threshold)
+    top = yt + int(top_rows.argmax())
+    bottom = bottom_y + len(bottom_rows) - int(bottom_rows[::-1].argmax())
+
+    left_cols = band((xl, top, min(w, l + margin), bottom)).any(axis=0)
+    right_x = max(0, r - margin)
+    right_cols = band((right_x, top, xr, bottom)).any(axis=0)
+    if not left_cols.any() or not right_cols.any() or (left_cols[0] and xl > 0) or (right_cols[-1] and xr < w):
+        return find_foreground_bbox(image, bg_threshold)
+    left = xl + int(left_cols.argmax())
+    right = right_x + len(right_cols) - int(right_cols[::-1].argmax())
+    return (left, top, right, bottom)
+
+
+def draft_size(size, reduction):
+    # Pillow volí mierku draftu ako celú časť plná / požadovaná veľkosť – pri zaokrúhlení nahor
+    # by nepárne rozmery draft vôbec nezmenšili; dekóder aj tak zaokrúhľuje výsledok nahor
+    return (max(1, int(size[0] // reduction)), max(1, int(size[1] // reduction)))
+
+
+def autocrop_proxy(image_path, max_side=1500, bg_threshold=10, proxy_side=512, analysis=None):
+    # Rýchly režim pre JPEG: box sa nájde na malom náhľade (DCT draft dekódovanie),
+    # potom sa dekóduje len rozlíšenie, ktoré výstup max_side potrebuje, a box sa
+    # spresní v pásoch okolo hrán. Pre iné formáty vracia None.
+    # Známy box z indexu analýzy náhľad úplne preskočí.
+    with Image.open(image_path) as proxy:
+        if proxy.format != 'JPEG':
+            return None
+        full_size = proxy.size
+        if analysis and tuple(analysis["size"]) == full_size:
+            known_box = analysis["bbox"]
+            proxy_box, proxy_scale = known_box, 1
+        else:
+            known_box = None
+            proxy.draft('RGB', draft_size(full_size, max(full_size) / proxy_side))
+            proxy_box = find_foreground_bbox(proxy, bg_threshold)
+            proxy_scale = full_size[0] / proxy.width
+
+    # Koľkokrát menšie rozlíšenie (1, 2, 4, 8) ešte stačí, aby výstup vznikal zmenšením
+    if proxy_box is None:
+        crop_long = max(full_size)
+    else:
+        crop_long = max(proxy_box[2] - proxy_box[0], proxy_box[3] - proxy_box[1]) * proxy_scale
+    reduction = 1
+    while reduction < 8 and crop_long / (reduction * 2) >= max_side:
+        reduction *= 2
+
+    image = Image.open(image_path)
+    image.draft('RGB', draft_size(full_size, reduction))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if proxy_box is None:
+        return image
+    if known_box:
+        return image.crop(scale_box(known_box, full_size, image.size))
+
+    factor = proxy_scale * image.width / full_size[0]
+    approx_box = tuple(int(round(v * factor)) for v in proxy_box)
+    # Okraj pásu: chyba mierky náhľadu plus jeden JPEG blok, kam siahajú artefakty kompresie
+    box = refine_bbox(image, approx_box, 2 * math.ceil(factor) + 8, bg_threshold)
+    if box is None:
+        return image
+    return image.crop(box)
+
+
+def final_layout(content_size, max_side=1500, padding=1.04):
+    # Rozloženie výstupu sa počíta vopred: strana plátna, veľkosť obsahu a jeho posun.
+    # Zodpovedá pôvodnému vloženiu do plátna side × side a zmenšeniu celého plátna na max_side.
+    w, h = content_size
+    side = int(max(w, h) * padding)
+    offset = ((side - w) // 2, (side - h) // 2)
+    if side <= max_side:
+        return side, content_size, offset
+
+    scale = max_side / side
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    offset = (min(round(offset[0] * scale), max_side - size[0]), min(round(offset[1] * scale), max_side - size[1]))
+    return max_side, size, offset
+
+
+def strip_bbox(reader, rows, bg_threshold=10):
+    # Pozadie z rohov – prvý a posledný riadok
+    w, h = reader.size
+    first, last = reader.read(0, 1), reader.read(h - 1, h)
+    corners = [first.getpixel((0, 0)), first.getpixel((w - 1, 0)),
+               last.getpixel((0, 0)), last.getpixel((w - 1, 0))]
+    bg_sum = np.array([sum(channel) for channel in zip(*corners)], dtype=np.int16)
+
+    # Box sa skladá priebežne z každého pásu
+    left, top, right, bottom = w, h, 0, 0
+    for y0 in range(0, h, rows):
+        y1 = min(y0 + rows, h)
+        band = reader.read(y0, y1)
+        mask = foreground_mask(band, (0, 0, w, y1 - y0), bg_sum, bg_threshold)
+        found_rows = mask.any(axis=1)
+        if not found_rows.any():
+            continue
+        found_cols = mask.any(axis=0)
+        top = min(top, y0 + int(found_rows.argmax()))
+        bottom = max(bottom, y1 - int(found_rows[::-1].argmax()))
+        left = min(left, int(found_cols.argmax()))
+        right = max(right, w - int(found_cols[::-1].argmax()))
+    if bottom <= top:
+        return None, bg_sum
+    return (left, top, right, bottom), bg_sum
+
+
+def strip_gimp_style(image_path, max_side=1500, padding=1.04, memory_limit=256 * 1024 * 1024, bg_threshold=10,
+                     analysis=None):
+    # Pásový režim pre obrovské obrázky: analýza aj zmenšenie prechádzajú obrázok po pásoch,
+    # naraz je v pamäti len jeden pás (pri nekomprimovaných formátoch aj pri dekódovaní)
+    reader = BandReader(image_path, min_size=(2 * max_side, 2 * max_side))
+    try:
+        w, h = reader.size
+        rows = band_rows(w, memory_limit)
+
+        if analysis and "bbox" in analysis and tuple(analysis["size"]) == reader.full_size:
+            box = analysis["bbox"] and scale_box(analysis["bbox"], reader.full_size, reader.size)
+        else:
+            box, bg_sum = strip_bbox(reader, rows, bg_threshold)
+            if analysis is not None and reader.size == reader.full_size:
+                analysis.update(describe_analysis(reader.size, bg_sum, box, bg_threshold))
+        left, top, right, bottom = box or (0, 0, w, h)
+
+        crop_w, crop_h = right - left, bottom - top
+        side, size, offset = final_layout((crop_w, crop_h), max_side, padding)
+        new_image = Image.new('RGB', (side, side), (255, 255, 255))
+
+        if size == (crop_w, crop_h):
+            for y0 in range(top, bottom, rows):
+                y1 = min(y0 + rows, bottom)
+                band = reader.read(y0, y1).crop((left, 0, right, y1 - y0))
+                new_image.paste(band, (offset[0], offset[1] + y0 - top))
+            return new_image
+
+        # Každý pás výstupu sa resampluje zo zdrojových riadkov s okrajom pre LANCZOS jadro;
+        # jadro sa oreže na hranách orezu rovnako ako pri zmenšení celého orezaného obrázka
+        scale = crop_h / size[1]
+        margin = lanczos_margin(scale)
+        out_rows = max(1, int((rows - 2 * margin) / scale))
+        for oy0 in range(0, size[1], out_rows):
+            oy1 = min(oy0 + out_rows, size[1])
+            sy0, sy1 = top + oy0 * scale, top + oy1 * scale
+            ry0 = max(top, math.floor(sy0) - margin)
+            ry1 = min(bottom, math.ceil(sy1) + margin)
+            band = reader.read(ry0, ry1).crop((left, 0, right, ry1 - ry0))
+            band = band.resize((size[0], oy1 - oy0), Image.Resampling.LANCZOS,
+                               box=(0, sy0 - ry0, crop_w, sy1 - ry0))
+            new_image.paste(band, (offset[0], offset[1] + oy0))
+        return new_image
+    finally:
+        reader.close()
+
+
+def full_batch_gimp_style(image_path, max_side=1500, proxy=False, padding=1.04, memory_limit=None,
+                          analysis=None, bg_threshold=10):
+    # analysis je záznam z indexu analýzy: ak obsahuje bbox, analýza sa preskočí;
+    # prázdny slovník sa naopak doplní, keď sa analýza spravila v plnom rozlíšení
+    if memory_limit:
+        return strip_gimp_style(image_path, max_side, padding, memory_limit, bg_threshold, analysis)
+
+    image = autocrop_proxy(image_path, max_side, bg_threshold, analysis=analysis) if proxy else None
+
+    if image is None:
+        image = load_rgb(Image.open(image_path))
+
+        if analysis and "bbox" in analysis and tuple(analysis["size"]) == image.size:
+            box = analysis["bbox"]
+        else:
+            box = find_foreground_bbox(image, bg_threshold)
+            if analysis is not None:
+                analysis.update(describe_analysis(image.size, background_sum(image), box, bg_threshold))
+        if box:
+            image = image.crop(box)
+
+    # Priamo sa zmenší len orezaný obsah, veľké plátno v plnom rozlíšení sa nevytvára
+    side, size, offset = final_layout(image.size, max_side, padding)
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    new_image = Image.new('RGB', (side, side), (255, 255, 255))
+    new_image.paste(image, offset)
+    return new_image
+
+
+_records_cache = {}
+
+
+def index_path(image_path):
+    return os.path.join(os.path.dirname(os.path.abspath(image_path)), INDEX_NAME)
+
+
+def load_records(path, item):
+    # JSON Lines vedľa zdrojov sa v procese načíta raz, znova len po zmene súboru;
+    # item(záznam) vracia (kľúč, hodnota), poškodené a neúplné riadky sa preskočia
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _records_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    records = {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    key, value = item(json.loads(line))
+                    records[key] = value
+                except (ValueError, TypeError, KeyError):
+                    continue  # neúplný riadok po prerušenom zápise alebo záznam bez kľúča
+    except OSError:
+        return {}
+    _records_cache[path] = (mtime, records)
+    return records
+
+
+def append_record(path, record):
+    # Neúplný posledný riadok (prerušený zápis) sa ukončí, inak by sa s ním nový záznam zlial
+    line = (json.dumps(record, sort_keys=True) + "\n").encode("utf-8")
+    with open(path, "a+b") as file:
+        size = file.seek(0, os.SEEK_END)
+        if size:
+            file.seek(size - 1)
+            if file.read(1) != b"\n":
+                line = b"\n" + line
+        file.write(line)
+
+
+def load_index(path):
+    return load_records(path, lambda entry: (entry["hash"], entry))
+
+
+def lookup_analysis(image_path, content_hash, bg_threshold=10):
+    entry = load_index(index_path(image_path)).get(content_hash)
+    if entry and entry.get("threshold") == bg_threshold:
+        return entry
+    return None
+
+
+def record_analysis(image_path, entry):
+    # Zapisuje len koordinátor (CLI), záznamy sa pridávajú na koniec súboru. Rovnaký obsah
+    # (dva súbory s rovnakým hashom v jednom behu) sa zapíše raz; chyba zápisu beh nezastaví.
+    path = index_path(image_path)
+    entries = load_index(path)
+    if entries.get(entry["hash"]) == entry:
+        return
+    try:
+        append_record(path, entry)
+    except OSError as e:
+        print(f"Cannot update analysis index {path}: {e}")
+        return
+    entries[entry["hash"]] = entry
+
+
+def analyze_file(filepath, memory_limit=None, bg_threshold=10):
+    # Režim "len analýza": vráti nový záznam do indexu alebo None, ak už v ňom je
+    content_hash = file_hash(filepath)
+    if lookup_analysis(filepath, content_hash, bg_threshold):
+        return None
+
+    if memory_limit:
+        reader = BandReader(filepath)
+        try:
+            box, bg_sum = strip_bbox(reader, band_rows(reader.size[0], memory_limit), bg_threshold)
+            size = reader.size
+        finally:
+            reader.close()
+    else:
+        image = load_rgb(Image.open(filepath))
+        box, bg_sum, size = find_foreground_bbox(image, bg_threshold), background_sum(image), image.size
+    return dict(describe_analysis(size, bg_sum, box, bg_threshold), hash=content_hash)
+
+
+def output_path(filepath, profile=DEFAULT_PROFILE, output_dir=None, suffix=""):
+    # Bez output_dir a suffix sa zdroj prepíše, ak už má príponu formátu profilu;
+    # inak výstup vznikne vedľa neho s vlastnou príponou (pod .png nezostanú JPEG bajty).
+    # Iný existujúci súbor vedľa zdroja (foo.jpg pre foo.png) sa prepíše, len ak je to
+    # výstup tohto zdroja z predchádzajúceho behu.
+    folder, name = os.path.split(filepath)
+    base = os.path.splitext(name)[0]
+    if not output_dir and not suffix and has_extension(filepath, profile):
+        return filepath
+
+    save_path = os.path.join(output_dir or folder, base + suffix + extension(profile))
+    if os.path.abspath(save_path) == os.path.abspath(filepath):
+        raise ValueError(f"Output {save_path} would overwrite the source")
+    if not suffix and os.path.abspath(os.path.dirname(save_path)) == os.path.abspath(folder) \
+            and os.path.exists(save_path) and derived_source(save_path) != name:
+        raise ValueError(f"Output {save_path} would overwrite another file")
+    return save_path
+
+
+def load_outputs(folder):
+    # {meno výstupu: meno zdroja} z OUTPUTS_NAME
+    return load_records(os.path.join(folder, OUTPUTS_NAME), lambda entry: (entry["output"], entry["source"]))
+
+
+def derived_source(path):
+    # Meno zdroja, z ktorého normalize vytvoril súbor path vedľa neho, ak zdroj ešte existuje
+    folder, name = os.path.split(os.path.abspath(path))
+    source = load_outputs(folder).get(name)
+    if source and os.path.exists(os.path.join(folder, source)):
+        return source
+    return None
+
+
+def record_output(source_path, save_path):
+    # Zapisuje len koordinátor; výstup do iného priečinka alebo na miesto zdroja sa nezaznamenáva
+    folder, source = os.path.split(os.path.abspath(source_path))
+    out_folder, name = os.path.split(os.path.abspath(save_path))
+    outputs = load_outputs(folder)
+    if out_folder != folder or name == source or outputs.get(name) == source:
+        return
+    try:
+        append_record(os.path.join(folder, OUTPUTS_NAME), {"output": name, "source": source})
+    except OSError as e:
+        print(f"Cannot record output {save_path}: {e}")
+        return
+    outputs[name] = source
+
+
+def normalize_inputs(paths):
+    # Vstupy bez výstupov predchádzajúcich behov – tie vznikajú znova zo svojich zdrojov
+    return (path for path in paths if not derived_source(path))
+
+
+def render_file(filepath, max_side=1500, profile=DEFAULT_PROFILE, proxy=False, memory_limit=None, use_index=False,
+                output_dir=None, suffix=""):
+    # Dekódovanie, analýza a kódovanie bez zápisu na disk – zapisuje až OutputWriter v koordinátore.
+    # Vracia (cesta výstupu, zakódované bajty, nový záznam do indexu analýzy alebo None).
+    save_path = output_path(filepath, profile, output_dir, suffix)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    analysis = entry = None
+    if use_index:
+        content_hash = file_hash(filepath)
+        entry = lookup_analysis(filepath, content_hash)
+        analysis = dict(entry) if entry else {}
+
+    final_image = full_batch_gimp_style(filepath, max_side=max_side, proxy=proxy, memory_limit=memory_limit,
+                                        analysis=analysis)
+
+    new_entry = None
+    if use_index and not entry and "bbox" in analysis:
+        new_entry = dict(analysis, hash=content_hash)
+    return save_path, encode_image(final_image, profile), new_entry
+
+
+def normalize_file(filepath, max_side=1500, profile=DEFAULT_PROFILE, proxy=False, memory_limit=None, use_index=False,
+                   output_dir=None, suffix=""):
+    # Ako render_file, ale zapíše hneď (atomicky) a vráti (cesta výstupu, zapísané bajty, záznam indexu)
+    save_path, data, new_entry = render_file(filepath, max_side, profile, proxy, memory_limit, use_index,
+                                             output_dir, suffix)
+    return save_path, write_atomic(save_path, data), new_entry
+
+
+def batch_normalize_fixed(filelist, progress_callback=None, max_side=1500, profile=DEFAULT_PROFILE, proxy=False):
+    for i, filepath in enumerate(filelist):
+        try:
+            normalize_file(filepath, max_side=max_side, profile=profile, proxy=proxy)
+
+            if progress_callback:
+                progress_callback(i + 1, len(filelist))
+        except Exception as e:
+            print(f"Error processing {filepath}: {e}")
@@ -1,19 +1,24 @@
 import os
-import csv
-import requests
 import sys
+from downloader import DEFAULT_DOWNLOAD_WORKERS, CsvRows, write_failed_csv
+from logview import LogModel, LogView, StatusFilter
+from workers import DownloadWorker
 from PyQt6.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, 
-                             QVBoxLayout, QStackedWidget, QFileDialog, 
-                             QFrame, QSizePolicy, QTextEdit, QProgressBar)
+                             QVBoxLayout, QHBoxLayout, QStackedWidget, QFileDialog, 
+                             QFrame, QSizePolicy, QProgressBar, QSpinBox, QComboBox)
 from PyQt6.QtGui import QFont
 from PyQt6.QtCore import Qt
 
+# Celý log sťahovania v cieľovom priečinku, v okne je len posledné okno riadkov
+LOG_NAME = ".imgops_downloads.log"
+
 class ImageDownloaderApp(QWidget):
     def __init__(self):
         super().__init__()
 
         self.csv_file = None
         self.target_folder = None
+        self.worker = None
 
         self.setWindowTitle("Foodora Style App")
         self.setGeometry(100, 100, 400, 450)
@@ -88,13 +93,43 @@ class ImageDownloaderApp(QWidget):
         self.btn_select_folder.clicked.connect(self.select_folder)
         layout.addWidget(self.btn_select_folder)
 
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Parallel downloads:"))
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, 64)
+        self.workers_spinbox.setValue(DEFAULT_DOWNLOAD_WORKERS)
+        workers_layout.addWidget(self.workers_spinbox)
+        layout.addLayout(workers_layout)
+
         self.btn_download = self.create_button("Run", enabled=False)
         self.btn_download.clicked.connect(self.download_images)
         layout.addWidget(self.btn_download)
 
-        self.result_text = QTextEdit()
-        self.result_text.setReadOnly(True)
-        layout.addWidget(self.result_text)
+        self.btn_cancel = self.create_button("Cancel", enabled=False)
+        self.btn_cancel.clicked.connect(self.cancel_download)
+        layout.addWidget(self.btn_cancel)
+
+        self.btn_export_failed = self.create_button("Export failed rows", enabled=False)
+        self.btn_export_failed.clicked.connect(self.export_failed)
+        layout.addWidget(self.btn_export_failed)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Show:"))
+        self.log_filter_combo = QComboBox()
+        for label, statuses in (("All", None), ("Saved", ("new", "updated")),
+                                ("Errors", ("failed",)), ("Messages", ("info",))):
+            self.log_filter_combo.addItem(label, statuses)
+        filter_layout.addWidget(self.log_filter_combo)
+        layout.addLayout(filter_layout)
+
+        # Log je model s ohraničeným oknom a dávkovými aktualizáciami, nie QTextEdit
+        self.log_model = LogModel(parent=self)
+        self.log_filter = StatusFilter(self.log_model, self)
+        self.log_filter_combo.currentIndexChanged.connect(
+            lambda: self.log_filter.set_statuses(self.log_filter_combo.currentData()))
+        self.result_list = LogView()
+        self.result_list.setModel(self.log_filter)
+        layout.addWidget(self.result_list)
 
         # Progress bar for download progress
         self.progress_bar = QProgressBar(self)
@@ -124,55 +159,116 @@ class ImageDownloaderApp(QWidget):
             self.update_download_button()
 
     def update_download_button(self):
-        if self.csv_file and self.target_folder:
+        if self.csv_file and self.target_folder and self.worker is None:
             self.btn_download.setEnabled(True)
             self.set_button_style(self.btn_download, True)
 
     def download_images(self):
         if not self.csv_file or not self.target_folder:
-            self.result_text.append("❌ Requirements are missing (CSV file or target folder).")
+            self.log_model.append("info", "❌ Requirements are missing (CSV file or target folder).")
+            return
+
+        # CSV sa nenačítava celé – kódovanie, oddeľovač a stĺpce sa zistia zo začiatku súboru
+        try:
+            rows = CsvRows(self.csv_file)
+        except OSError:
+            rows = None
+        if rows is None or not rows.total_bytes:
+            self.log_model.append("info", "❌ CSV file is empty or invalid..")
             return
-        
-        self.result_text.append("🟡 Sťahovanie začalo...")
-        failed = []
-        
-        with open(self.csv_file, "r", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            rows = list(reader)
-            
-            if len(rows) < 2:
-                self.result_text.append("❌ CSV file is empty or invalid..")
-                return
-            
-            total = len(rows) - 1
-            for i, row in enumerate(rows[1:], 1):
-                if len(row) < 2:
-                    continue
-
-                ean, img_url = row[0], row[1]
-                img_path = os.path.join(self.target_folder, f"{ean}.jpg")
-                
-                try:
-                    response = requests.get(img_url, timeout=10)
-                    response.raise_for_status()
-                    with open(img_path, "wb") as img_file:
-                        img_file.write(response.content)
-                    self.result_text.append(f"✅ {ean}.jpg saved.")
-                except requests.exceptions.RequestException:
-                    failed.append(f"{ean} ({img_url})")
-                
-                # Update the download progress during the download process
-                progress = int(i / total * 100)
-                self.progress_bar.setValue(progress)  # Update the progress bar
-                QApplication.processEvents()  # Make sure the UI updates during download
-
-        if failed:
-            self.result_text.append("\n❌The following images could not be downloaded:")
-            for item in failed:
-                self.result_text.append(f" - {item}")
-        
-        self.result_text.append("\n✅ Download complete.")
-        self.progress_bar.setValue(100)  # Ensure the progress bar reaches 100% after completion
+
+        self.log_model.clear()
+        self.log_path = os.path.join(self.target_folder, LOG_NAME)
+        try:
+            self.log_model.open_file(self.log_path)
+        except OSError:
+            self.log_path = None
+        self.log_model.append("info", "🟡 Sťahovanie začalo...")
+        self.failed_rows = []
+        self.progress_bar.setValue(0)
+        self.btn_export_failed.setEnabled(False)
+        self.set_button_style(self.btn_export_failed, False)
+
+        # Sťahuje sa vo vláknach mimo GUI vlákna, priebeh chodí cez signály
+        self.worker = DownloadWorker(rows, self.target_folder, self.workers_spinbox.value(), parent=self)
+        self.worker.row_done.connect(self.row_done)
+        self.worker.row_failed.connect(self.row_failed)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.batch_finished.connect(self.download_finished)
+
+        for button, enabled in ((self.btn_download, False), (self.btn_cancel, True)):
+            button.setEnabled(enabled)
+            self.set_button_style(button, enabled)
+        self.worker.start()
+
+    def row_done(self, ean, status, img_path):
+        # Nezmenené obrázky (304) sa v okne len zarátajú do súhrnu, do súboru logu ide každý riadok
+        if status in ("new", "updated"):
+            self.log_model.append(status, f"✅ {os.path.basename(img_path)} saved.")
+        else:
+            self.log_model.append(status, f"➖ {os.path.basename(img_path)} {status}.", visible=False)
+
+    def row_failed(self, ean, img_url, error):
+        self.failed_rows.append((ean, img_url, error))
+        self.log_model.append("failed", f"❌ {ean} ({img_url}): {error}")
+
+    def update_progress(self, completed, total):
+        self.progress_bar.setValue(int(completed / total * 100))
+
+    def cancel_download(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.btn_cancel.setEnabled(False)
+            self.set_button_style(self.btn_cancel, False)
+
+    def stop_workers(self):
+        # Sťahovanie sa zruší a počká sa naň (manifest uloží samotné vlákno), až potom sa okno zruší
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+            self.log_model.close_file()
+
+    def closeEvent(self, event):
+        self.stop_workers()
+        super().closeEvent(event)
+
+    def download_finished(self, done, failed, cancelled):
+        if not done and not failed and not cancelled:
+            self.log_model.append("info", "❌ CSV file is empty or invalid..")
+
+        self.worker.wait()
+        counts = self.worker.manifest.counts
+        self.worker = None
+        self.btn_cancel.setEnabled(False)
+        self.set_button_style(self.btn_cancel, False)
+        self.update_download_button()
+
+        if counts["unchanged"] or counts["skipped"]:
+            self.log_model.append("info", f"ℹ️ Unchanged: {counts['unchanged']}, skipped: {counts['skipped']}")
+
+        if self.failed_rows:
+            self.btn_export_failed.setEnabled(True)
+            self.set_button_style(self.btn_export_failed, True)
+            self.log_model.append("info", f"❌ Could not download: {len(self.failed_rows)} "
+                                  f"(filter Errors or Export failed rows)")
+
+        if cancelled:
+            self.log_model.append("info", "⏹ Download cancelled.")
+        else:
+            self.log_model.append("info", "✅ Download complete.")
+            self.progress_bar.setValue(100)
+
+        if self.log_path:
+            self.log_model.append("info", f"📄 Full log: {self.log_path}")
+        self.log_model.close_file()
+        self.log_model.flush()
+
+    def export_failed(self):
+        # Uložený CSV má rovnaký tvar ako vstup, dá sa rovno vybrať na ďalšie sťahovanie
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save failed rows", "failed.csv", "CSV Files (*.csv)")
+        if file_path:
+            write_failed_csv(file_path, self.failed_rows)
+            self.log_model.append("info", f"💾 Failed rows saved to {file_path}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,63 @@
+import io
+import os
+import hashlib
+from collections import deque
+from batch import Deduplicator, link_file, run_jobs, write_results
+from downloader import (DEDUP_WINDOW, DEFAULT_DOWNLOAD_WORKERS, DEFAULT_MAX_BYTES, DEFAULT_PER_HOST, DEFAULT_RETRIES,
+                        run_downloads)
+from encoders import DEFAULT_PROFILE, encode_image, extension
+from normalizer import full_batch_gimp_style
+from tagging import apply_badges, output_name
+
+
+def product_name(ean, badges, profile=DEFAULT_PROFILE):
+    # S štítkami rovnaké meno ako pri tagovaní (<ean>_TAG.jpg), bez nich <ean> s príponou profilu
+    if badges:
+        return output_name(f"{ean}.jpg", profile)
+    return f"{ean}{extension(profile)}"
+
+
+def render_product(ean, data, badges, target_folder, max_side=1500, profile=DEFAULT_PROFILE, proxy=False):
+    # Stiahnuté bajty -> normalizácia -> štítky v pamäti, kóduje sa iba raz na konci.
+    # Vracia (cesta výstupu, zakódované bajty) pre OutputWriter.
+    image = full_batch_gimp_style(io.BytesIO(data), max_side=max_side, proxy=proxy)
+    if badges:
+        image = apply_badges(image, badges)
+    return os.path.join(target_folder, product_name(ean, badges, profile)), encode_image(image, profile)
+
+
+def run_pipeline(rows, badges, target_folder, max_side=1500, profile=DEFAULT_PROFILE, proxy=False, max_workers=None,
+                 download_workers=DEFAULT_DOWNLOAD_WORKERS, timeout=10, max_bytes=DEFAULT_MAX_BYTES,
+                 retries=DEFAULT_RETRIES, per_host=DEFAULT_PER_HOST, rate=None, cancelled=None):
+    # Generátor ((ean, url), (cesta, bajty), chyba). Všetky tri fázy bežia naraz a každá má
+    # ohraničený rad: sťahovanie vo vláknach (okno run_downloads), normalizácia a štítky
+    # v process poole (okno run_jobs) a zápis na vlákne OutputWriter-a.
+    # Duplicitné URL sa sťahujú a duplicitný obsah spracúva iba raz, ďalšie EAN dostanú hardlink výstupu.
+    failures = deque()
+
+    def materialize(result, key, args):
+        save_path, written = result
+        return link_file(save_path, os.path.join(target_folder, product_name(key[0], badges, profile))), 0
+
+    same_url = Deduplicator(lambda key, args: key[1], materialize, max_done=DEDUP_WINDOW)
+    same_content = Deduplicator(lambda key, args: hashlib.sha256(args[1]).digest(), materialize, max_done=DEDUP_WINDOW)
+
+    def jobs():
+        unique_rows = (key for key, args in same_url.filter(((ean, img_url), None) for ean, img_url in rows))
+        downloads = run_downloads(unique_rows, target_folder, download_workers, timeout, cancelled, max_bytes=max_bytes,
+                                  retries=retries, per_host=per_host, rate=rate, into_memory=True)
+        for key, data, error in downloads:
+            if error is not None:
+                failures.append((key, None, error))
+                continue
+            yield key, (key[0], data, badges, target_folder, max_side, profile, proxy)
+
+    def stream():
+        for result in write_results(run_jobs(render_product, same_content.filter(jobs()), max_workers, cancelled)):
+            while failures:
+                yield failures.popleft()
+            yield result
+        while failures:
+            yield failures.popleft()
+
+    yield from same_url.results(same_content.results(stream()))
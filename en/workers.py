@@ -0,0 +1,133 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtGui import QImage
+from batch import default_worker_count, run_jobs, write_results
+from downloader import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_MAX_BYTES, DEFAULT_PER_HOST, DownloadManifest, run_downloads
+from tagging import tag_thumbnail
+
+
+class PoolWorker(QThread):
+    # QThread koordinuje process pool, GUI vlákno dostáva len signály.
+    # jobs je zoznam (kľúč, argumenty) – kľúč (zvyčajne cesta vstupu) sa vracia v signáloch.
+    # S write_outputs funkcia vracia (cesta, dáta, ...) a zapisuje ich OutputWriter mimo poolu.
+    # dedup (batch.Deduplicator) sa voliteľne zaradí okolo poolu, napr. batch.claim_outputs(target).
+    file_done = pyqtSignal(str, object)
+    file_failed = pyqtSignal(str, str)
+    progress = pyqtSignal(int, int)
+    batch_finished = pyqtSignal(int, int, bool)
+
+    def __init__(self, func, jobs, max_workers=None, parent=None, write_outputs=False, dedup=None):
+        super().__init__(parent)
+        self.func = func
+        self.write_outputs = write_outputs
+        self.dedup = dedup
+        self.jobs = list(jobs)
+        self.max_workers = max_workers or default_worker_count()
+        self._cancelled = False
+        self._paused = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def set_paused(self, paused):
+        self._paused = paused
+
+    def is_paused(self):
+        return self._paused
+
+    def run(self):
+        total = len(self.jobs)
+        done = failed = 0
+
+        jobs = self.dedup.filter(self.jobs) if self.dedup else self.jobs
+        results = run_jobs(self.func, jobs, self.max_workers, lambda: self._cancelled, lambda: self._paused)
+        if self.write_outputs:
+            results = write_results(results)
+        if self.dedup:
+            results = self.dedup.results(results)
+
+        # batch_finished príde vždy, aj po neočakávanej chybe – okno inak zostane zablokované
+        try:
+            for key, result, error in results:
+                if error is not None:
+                    failed += 1
+                    print(f"Error processing {key}: {error}")
+                    self.file_failed.emit(key, str(error))
+                else:
+                    done += 1
+                    self.file_done.emit(key, result)
+                self.progress.emit(done + failed, total)
+        finally:
+            self.batch_finished.emit(done, failed, self._cancelled)
+
+
+class DownloadWorker(QThread):
+    # Sťahovanie CSV riadkov (ean, url) vo vláknach mimo GUI vlákna, výsledky cez signály.
+    # row_done posiela (ean, stav, cesta), stav je "new", "updated", "unchanged" alebo "skipped".
+    # rows je downloader.CsvRows – číta sa priebežne a priebeh sa hlási v prečítaných KB súboru.
+    row_done = pyqtSignal(str, str, str)
+    row_failed = pyqtSignal(str, str, str)
+    progress = pyqtSignal(int, int)
+    batch_finished = pyqtSignal(int, int, bool)
+
+    def __init__(self, rows, target_folder, max_workers=DEFAULT_DOWNLOAD_WORKERS, timeout=10, parent=None,
+                 max_bytes=DEFAULT_MAX_BYTES, per_host=DEFAULT_PER_HOST, rate=None):
+        super().__init__(parent)
+        self.rows = rows
+        self.target_folder = target_folder
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.per_host = per_host
+        self.rate = rate
+        self.manifest = DownloadManifest(target_folder)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        total = max(1, self.rows.total_bytes // 1024)
+        done = failed = 0
+        reported = -1
+
+        results = run_downloads(self.rows, self.target_folder, self.max_workers, self.timeout,
+                                lambda: self._cancelled, max_bytes=self.max_bytes, manifest=self.manifest,
+                                per_host=self.per_host, rate=self.rate)
+        try:
+            for (ean, img_url), result, error in results:
+                if error is not None:
+                    failed += 1
+                    self.row_failed.emit(ean, img_url, str(error))
+                else:
+                    done += 1
+                    self.row_done.emit(ean, result[0], result[1])
+                # Priebeh len pri zmene – pri malých riadkoch by inak GUI dostávalo signál za každý riadok
+                completed = min(total, self.rows.bytes_read // 1024)
+                if completed * 100 // total != reported:
+                    reported = completed * 100 // total
+                    self.progress.emit(completed, total)
+        finally:
+            self.manifest.save()
+            self.batch_finished.emit(done, failed, self._cancelled)
+
+
+class ThumbnailLoader(QThread):
+    # Náhľady štítkov sa pripravujú mimo GUI vlákna; QImage (na rozdiel od QPixmap) sa tu vytvoriť smie
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    def __init__(self, tag_paths, cache_dir, size=32, parent=None):
+        super().__init__(parent)
+        self.tag_paths = list(tag_paths)
+        self.cache_dir = cache_dir
+        self.size = size
+
+    def run(self):
+        for tag_path in self.tag_paths:
+            if self.isInterruptionRequested():
+                return
+            try:
+                thumb_path = tag_thumbnail(tag_path, self.cache_dir, self.size)
+            except Exception as e:
+                print(f"Error loading thumbnail {tag_path}: {e}")
+                continue
+            self.thumbnail_ready.emit(tag_path, QImage(thumb_path))
@@ -0,0 +1,88 @@
+import io
+import os
+from collections import Counter
+from PIL import features
+
+# Pomenované profily enkódera. "jpeg-default" zodpovedá pôvodnému správaniu (Pillow default, quality 75).
+PROFILES = {
+    "jpeg-default": {"format": "JPEG"},
+    "jpeg-web": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+    "jpeg-small": {"format": "JPEG", "quality": 75, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+    "jpeg-high": {"format": "JPEG", "quality": 92, "optimize": True, "subsampling": "4:4:4"},
+    "jpeg-fast": {"format": "JPEG", "quality": 85, "subsampling": "4:2:0"},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "webp-small": {"format": "WEBP", "quality": 70, "method": 6},
+    "avif": {"format": "AVIF", "quality": 60, "speed": 6},
+}
+DEFAULT_PROFILE = "jpeg-default"
+
+EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "AVIF": ".avif"}
+FEATURES = {"WEBP": "webp", "AVIF": "avif"}
+
+
+def format_supported(image_format):
+    feature = FEATURES.get(image_format)
+    return feature is None or bool(features.check(feature))
+
+
+def available_profiles():
+    return [name for name, settings in PROFILES.items() if format_supported(settings["format"])]
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoder profile {name!r}")
+    settings = PROFILES[name]
+    if not format_supported(settings["format"]):
+        raise ValueError(f"Encoder profile {name!r} needs {settings['format']} support in Pillow")
+    return settings
+
+
+def extension(name):
+    return EXTENSIONS[get_profile(name)["format"]]
+
+
+def has_extension(path, name):
+    ext = os.path.splitext(path)[1].lower()
+    return ext == extension(name) or (ext == ".jpeg" and extension(name) == ".jpg")
+
+
+def encode_image(image, profile=DEFAULT_PROFILE):
+    # Zakóduje obrázok podľa profilu do pamäte, zápis na disk je na volajúcom
+    settings = dict(get_profile(profile))
+    image_format = settings.pop("format")
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **settings)
+    return buffer.getvalue()
+
+
+def save_image(image, save_path, profile=DEFAULT_PROFILE):
+    # Uloží obrázok podľa profilu a vráti počet zapísaných bajtov
+    settings = dict(get_profile(profile))
+    image_format = settings.pop("format")
+    image.save(save_path, image_format, **settings)
+    return os.path.getsize(save_path)
+
+
+def format_size(num_bytes):
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+
+class EncoderReport:
+    # Súhrn zapísaných súborov a bajtov pre každý profil
+    def __init__(self):
+        self.files = Counter()
+        self.bytes = Counter()
+
+    def add(self, profile, num_bytes):
+        if num_bytes:
+            self.files[profile] += 1
+            self.bytes[profile] += num_bytes
+
+    def lines(self):
+        return [f"{profile}: {self.files[profile]} files, {format_size(self.bytes[profile])}"
+                for profile in sorted(self.files)]
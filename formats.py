@@ -0,0 +1,88 @@
+import os
+from PIL import Image
+from encoders import save_image
+from imaging import load_rgb
+
+# Pravidlá pre stiahnuté obrázky: JPEG v RGB alebo odtieňoch sivej do MAX_PIXELS sa uloží bajt po bajte,
+# všetko ostatné sa raz prekóduje do JPEG (TRANSCODE_PROFILE), čo sa nedá dekódovať, sa odmietne
+PASSTHROUGH_MODES = ("RGB", "L")
+MAX_PIXELS = 50 * 1000 * 1000
+TRANSCODE_PROFILE = "jpeg-high"
+
+SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+)
+
+
+def sniff_format(head):
+    # Formát podľa magického čísla na začiatku súboru, None ak to nie je známy obrázok
+    for signature, name in SIGNATURES:
+        if head.startswith(signature):
+            return name
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "AVIF"
+    return None
+
+
+def describe_head(head):
+    text = head.lstrip()[:64].lower()
+    if text.startswith((b"<!doctype html", b"<html")):
+        return "an HTML page"
+    if text.startswith((b"<", b"{", b"[")):
+        return "a text document"
+    if not head:
+        return "empty"
+    return f"unknown data starting with {head[:8].hex()}"
+
+
+def check_head(head, img_url):
+    # Už prvý kúsok odpovede prezradí chybovú stránku – zvyšok sa vôbec nesťahuje
+    image_format = sniff_format(head)
+    if image_format is None:
+        raise ValueError(f"{img_url} is not an image ({describe_head(head)})")
+    return image_format
+
+
+def jpeg_complete(path):
+    # Úplný JPEG končí značkou EOI (FF D9), niektoré servery za ňu pridávajú nuly alebo nové riadky
+    with open(path, "rb") as file:
+        file.seek(max(0, os.path.getsize(path) - 1024))
+        tail = file.read()
+    return tail.rstrip(b"\x00\r\n ").endswith(b"\xff\xd9")
+
+
+def prepare_image(path, max_pixels=MAX_PIXELS):
+    # Vracia (formát, "passthrough" alebo "transcoded"); prekódovaný JPEG nahradí súbor na mieste
+    with open(path, "rb") as file:
+        image_format = sniff_format(file.read(16))
+    if image_format is None:
+        raise ValueError(f"{os.path.basename(path)} is not an image")
+
+    tmp_path = path + ".jpg.tmp"
+    try:
+        with Image.open(path) as image:
+            within_policy = image.mode in PASSTHROUGH_MODES and image.width * image.height <= max_pixels
+            if image_format == "JPEG" and within_policy and jpeg_complete(path):
+                return image_format, "passthrough"
+
+            image.load()
+            # Priehľadnosť sa skladá na bielu ako v normalizéri, odtiene sivej ostávajú v L
+            image = image.convert("L") if image.mode in ("1", "L", "I;16") else load_rgb(image)
+            if image.width * image.height > max_pixels:
+                scale = (max_pixels / (image.width * image.height)) ** 0.5
+                image.thumbnail((int(image.width * scale), int(image.height * scale)), Image.Resampling.LANCZOS)
+            save_image(image, tmp_path, TRANSCODE_PROFILE)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise ValueError(f"cannot decode {image_format}: {e}")
+    os.replace(tmp_path, path)
+    return image_format, "transcoded"
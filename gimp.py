@@ -1,9 +1,13 @@
-from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QPushButton, QVBoxLayout, QWidget, QProgressBar, QLabel
+from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QPushButton, QVBoxLayout, QWidget, QProgressBar, QLabel, QComboBox, QCheckBox, QSpinBox, QHBoxLayout
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap, QPalette, QBrush
-from PIL import Image
 import os
-import numpy as np
+import normalizer
+from batch import IMAGE_EXTENSIONS, claim_outputs, default_worker_count
+from encoders import DEFAULT_PROFILE, EncoderReport, available_profiles
+from workers import PoolWorker
+
+IMAGE_FILTER = "Images (" + " ".join("*" + ext for ext in IMAGE_EXTENSIONS) + ")"
 
 class ImageNormalizerAppWrapper:
     def __init__(self):
@@ -14,69 +18,18 @@ class ImageNormalizerAppWrapper:
         self.window.show()
         self.app.exec()
 
-    @staticmethod
-    def smart_autocrop(image, bg_threshold=10):
-        image = image.convert('RGB')
-        np_img = np.array(image)
-        corners = [
-            np_img[0, 0],
-            np_img[0, -1],
-            np_img[-1, 0],
-            np_img[-1, -1]
-        ]
-        bg_color = np.mean(corners, axis=0)
-        diff = np.abs(np_img - bg_color).sum(axis=2)
-        mask = diff > bg_threshold
-
-        if not mask.any():
-            return image
-
-        coords = np.argwhere(mask)
-        y0, x0 = coords.min(axis=0)
-        y1, x1 = coords.max(axis=0) + 1
-        return image.crop((x0, y0, x1, y1))
-
-    @classmethod
-    def full_batch_gimp_style(cls, image_path, max_side=1500):
-        image = Image.open(image_path)
-        if image.mode == 'RGBA':
-            background = Image.new('RGBA', image.size, (255, 255, 255, 255))
-            background.paste(image, (0, 0), image)
-            image = background.convert('RGB')
-        else:
-            image = image.convert('RGB')
-
-        image = cls.smart_autocrop(image)
-
-        side = int(max(image.width, image.height) * 1.04)
-        new_image = Image.new('RGB', (side, side), (255, 255, 255))
-        offset_x = (side - image.width) // 2
-        offset_y = (side - image.height) // 2
-        new_image.paste(image, (offset_x, offset_y))
-
-        if side > max_side:
-            new_image = new_image.resize((max_side, max_side), Image.Resampling.LANCZOS)
-
-        return new_image
-
-    @classmethod
-    def batch_normalize_fixed(cls, filelist, progress_callback=None, max_side=1500):
-        for i, filepath in enumerate(filelist):
-            try:
-                final_image = cls.full_batch_gimp_style(filepath, max_side=max_side)
-                final_image.save(filepath, "JPEG")
-
-                if progress_callback:
-                    progress_callback(i + 1, len(filelist))
-            except Exception as e:
-                print(f"Error processing {filepath}: {e}")
+    # Jadro normalizácie je v normalizer.py (bez Qt), aby ho mohlo použiť aj CLI
+    smart_autocrop = staticmethod(normalizer.smart_autocrop)
+    full_batch_gimp_style = staticmethod(normalizer.full_batch_gimp_style)
+    batch_normalize_fixed = staticmethod(normalizer.batch_normalize_fixed)
 
     class ImageNormalizerApp(QMainWindow):
         def __init__(self, wrapper):
             super().__init__()
             self.wrapper = wrapper
+            self.worker = None
             self.setWindowTitle("Batch Image Normalizer")
-            self.setFixedSize(400, 300)
+            self.setFixedSize(400, 510)
             self.set_background()
 
             layout = QVBoxLayout()
@@ -86,12 +39,45 @@ class ImageNormalizerAppWrapper:
             self.select_button.clicked.connect(self.select_files)
             layout.addWidget(self.select_button)
 
+            layout.addWidget(QLabel("Formát výstupu:"))
+            self.profile_dropdown = QComboBox()
+            self.profile_dropdown.addItems(available_profiles())
+            self.profile_dropdown.setCurrentText(DEFAULT_PROFILE)
+            layout.addWidget(self.profile_dropdown)
+
+            self.proxy_checkbox = QCheckBox("Rýchly režim pre JPEG (analýza na náhľade)")
+            layout.addWidget(self.proxy_checkbox)
+
+            self.keep_checkbox = QCheckBox("Zachovať originály (výstup do podpriečinka normalized)")
+            layout.addWidget(self.keep_checkbox)
+
+            workers_layout = QHBoxLayout()
+            workers_layout.addWidget(QLabel("Počet procesov:"))
+            self.workers_spinbox = QSpinBox()
+            self.workers_spinbox.setRange(1, 64)
+            self.workers_spinbox.setValue(default_worker_count())
+            workers_layout.addWidget(self.workers_spinbox)
+            layout.addLayout(workers_layout)
+
             self.button = QPushButton("Spustiť")
             self.button.setStyleSheet(self.button_style(False))
             self.button.setEnabled(False)
             self.button.clicked.connect(self.start_normalization)
             layout.addWidget(self.button)
 
+            control_layout = QHBoxLayout()
+            self.pause_button = QPushButton("Pozastaviť")
+            self.pause_button.setStyleSheet(self.button_style(False))
+            self.pause_button.setEnabled(False)
+            self.pause_button.clicked.connect(self.toggle_pause)
+            control_layout.addWidget(self.pause_button)
+
+            self.cancel_button = QPushButton("Zrušiť")
+            self.cancel_button.setStyleSheet(self.button_style(False))
+            self.cancel_button.setEnabled(False)
+            self.cancel_button.clicked.connect(self.cancel_normalization)
+            control_layout.addWidget(self.cancel_button)
+            layout.addLayout(control_layout)
 
             self.progress_bar = QProgressBar(self)
             self.progress_bar.setRange(0, 100)
@@ -143,7 +129,7 @@ class ImageNormalizerAppWrapper:
                 """
 
         def select_files(self):
-            files, _ = QFileDialog.getOpenFileNames(self, "Vyberte Obrázky", "", "Images (*.png *.jpg *.jpeg *.bmp)")
+            files, _ = QFileDialog.getOpenFileNames(self, "Vyberte Obrázky", "", IMAGE_FILTER)
             if files:
                 self.selected_files = files
                 self.enable_normalize_button(True)
@@ -161,13 +147,89 @@ class ImageNormalizerAppWrapper:
             if hasattr(self, 'selected_files') and self.selected_files:
                 self.status_label.setText("Začínam s normalizovaním...")
                 self.progress_bar.setValue(0)
-                self.wrapper.batch_normalize_fixed(self.selected_files, self.update_progress)
+
+                # Normalizácia beží v process poole mimo GUI vlákna, výsledky chodia cez signály
+                profile = self.profile_dropdown.currentText()
+                proxy = self.proxy_checkbox.isChecked()
+                keep = self.keep_checkbox.isChecked()
+                self.encoder_report = EncoderReport()
+                self.profile = profile
+                def out_dir(filepath):
+                    return os.path.join(os.path.dirname(filepath), "normalized") if keep else None
+
+                def target(filepath):
+                    return normalizer.output_path(filepath, profile, out_dir(filepath))
+
+                # Výstupy predchádzajúcich behov (foo.jpg z foo.png) sa nespracúvajú ako ďalšie zdroje
+                jobs = [(filepath, (filepath, 1500, profile, proxy, None, False, out_dir(filepath)))
+                        for filepath in normalizer.normalize_inputs(self.selected_files)]
+                self.worker = PoolWorker(normalizer.render_file, jobs, self.workers_spinbox.value(), self,
+                                         write_outputs=True, dedup=claim_outputs(target))
+                self.worker.progress.connect(self.update_progress)
+                self.worker.file_done.connect(self.file_done)
+                self.worker.file_failed.connect(self.file_failed)
+                self.worker.batch_finished.connect(self.normalization_finished)
+
                 self.selected_files = []
                 self.enable_normalize_button(False)
-                self.status_label.setText("Obrázky boli úspešne normalizované.")
+                self.select_button.setEnabled(False)
+                self.enable_control_buttons(True)
+                self.worker.start()
             else:
                 print("Neboli vybrané žiadne obrázky na spracovanie.")
 
+        def enable_control_buttons(self, enable):
+            for button in (self.pause_button, self.cancel_button):
+                button.setEnabled(enable)
+                button.setStyleSheet(self.button_style(enable))
+            self.pause_button.setText("Pozastaviť")
+
+        def toggle_pause(self):
+            if self.worker is None:
+                return
+            paused = not self.worker.is_paused()
+            self.worker.set_paused(paused)
+            self.pause_button.setText("Pokračovať" if paused else "Pozastaviť")
+            if paused:
+                self.status_label.setText("Pozastavené...")
+
+        def cancel_normalization(self):
+            if self.worker is not None:
+                self.worker.cancel()
+                self.worker.set_paused(False)
+                self.enable_control_buttons(False)
+
+        def stop_workers(self):
+            # Vlákno s process poolom musí skončiť skôr, než Qt zruší okno
+            if self.worker is not None:
+                self.worker.cancel()
+                self.worker.wait()
+
+        def closeEvent(self, event):
+            self.stop_workers()
+            super().closeEvent(event)
+
+        def file_done(self, filepath, result):
+            normalizer.record_output(filepath, result[0])
+            self.encoder_report.add(self.profile, result[1])
+            self.status_label.setText(f"Hotovo: {os.path.basename(filepath)}")
+
+        def file_failed(self, filepath, error):
+            self.status_label.setText(f"Chyba: {os.path.basename(filepath)} ({error})")
+
+        def normalization_finished(self, done, failed, cancelled):
+            self.worker.wait()
+            self.worker = None
+            self.enable_control_buttons(False)
+            self.select_button.setEnabled(True)
+            if cancelled:
+                summary = f"Normalizácia bola zrušená. Normalizované: {done}"
+            elif failed:
+                summary = f"Normalizované: {done}, chyby: {failed}"
+            else:
+                summary = "Obrázky boli úspešne normalizované."
+            self.status_label.setText("\n".join([summary] + self.encoder_report.lines()))
+
         def update_progress(self, current, total):
             progress = int(current / total * 100)
             self.progress_bar.setValue(progress)
@@ -0,0 +1,342 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+from batch import Deduplicator, claim_outputs, default_worker_count, inode_identity, iter_inputs, link_file, run_jobs, write_results
+from downloader import (DEFAULT_DOWNLOAD_WORKERS, DEFAULT_MAX_BYTES, DEFAULT_PER_HOST, DEFAULT_RETRIES, DownloadManifest,
+                        iter_csv_rows, run_downloads, write_failed_csv)
+from encoders import DEFAULT_PROFILE, PROFILES, EncoderReport, get_profile
+from normalizer import analyze_file, normalize_inputs, output_path, record_analysis, record_output, render_file
+from pipeline import run_pipeline
+from tagging import TagManifest, badges_recipe, output_name, tag_image_incremental
+
+# Bez Qt – štítky hľadáme v priečinku images vedľa skriptu, ak nie je zadaný iný
+if getattr(sys, 'frozen', False):
+    IMAGE_PATH = os.path.join(sys._MEIPASS, "images")
+else:
+    IMAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+
+def parse_position(value):
+    try:
+        row, col = (int(part) for part in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid position {value!r}, expected ROW,COL")
+    if not (1 <= row <= 3 and 1 <= col <= 3):
+        raise argparse.ArgumentTypeError(f"position {value!r} is outside the 3x3 grid")
+    return (row - 1, col - 1)
+
+
+def resolve_tag(tag, tags_dir):
+    if os.path.isfile(tag):
+        return tag
+    return os.path.join(tags_dir, tag)
+
+
+def report(name, results, verbose):
+    done = failed = 0
+    for key, result, error in results:
+        if error is not None:
+            failed += 1
+            print(f"FAILED {key}: {error}", file=sys.stderr)
+        else:
+            done += 1
+            if verbose:
+                print(f"ok {key} -> {result}")
+    print(f"{name}: {done} ok, {failed} failed")
+    return 1 if failed else 0
+
+
+def parse_badges(tags, default_position, tags_dir):
+    # Každý --tag je NAME alebo NAME@ROW,COL; štítky sa nanášajú v zadanom poradí
+    badges = []
+    for spec in tags:
+        name, sep, position = spec.rpartition("@")
+        if not sep:
+            name, position = spec, None
+        position = parse_position(position) if position else default_position
+        tag_path = resolve_tag(name, tags_dir)
+        if not os.path.isfile(tag_path):
+            raise FileNotFoundError(f"Tag {name} was not found!")
+        badges.append((tag_path, position))
+    return badges
+
+
+def cmd_tag(args):
+    try:
+        get_profile(args.profile)
+        badges = parse_badges(args.tag, args.position, args.tags_dir)
+    except (ValueError, FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    manifest = TagManifest(args.out)
+    encoder_report = EncoderReport()
+    recipe = badges_recipe(badges, args.profile)
+    jobs = ((path, (path, badges, args.out, recipe, manifest.previous(path), args.force))
+            for path in iter_inputs(args.inputs))
+
+    def target(path):
+        return os.path.join(args.out, output_name(path, args.profile))
+
+    def materialize(result, key, args_):
+        # Hardlinkovaný vstup (rovnaký inode) dostane hardlink výstupu namiesto ďalšieho tagovania
+        status, save_path, entry, written = result
+        previous = manifest.previous(key)
+        if not args.force and previous == entry and os.path.exists(target(key)):
+            return "skipped", target(key), entry, 0
+        return ("rebuilt" if previous else "new"), link_file(save_path, target(key)), entry, 0
+
+    dedup = Deduplicator(inode_identity, materialize)
+    claims = claim_outputs(target)
+
+    def recorded(results):
+        for key, result, error in results:
+            if error is None:
+                manifest.record(key, result)
+                encoder_report.add(args.profile, result[3])
+                result = f"{result[1]} ({result[0]})"
+            yield key, result, error
+
+    try:
+        # Vstupy s rovnakým výstupným názvom (p2.jpg a p2.png) – druhý sa nahlási ako chyba, nič sa neprepíše
+        results = run_jobs(tag_image_incremental, dedup.filter(claims.filter(jobs)), args.workers)
+        results = claims.results(dedup.results(results))
+        return report("tag", recorded(results), args.verbose)
+    finally:
+        manifest.save()
+        counts = manifest.counts
+        print(f"tag: {counts['new']} new, {counts['rebuilt']} rebuilt, {counts['skipped']} skipped, "
+              f"{dedup.duplicates} hardlinked inputs shared")
+        for line in encoder_report.lines():
+            print(f"tag: {line}")
+
+
+def cmd_normalize(args):
+    try:
+        get_profile(args.profile)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    encoder_report = EncoderReport()
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+    jobs = ((path, (path, args.max_side, args.profile, args.proxy, memory_limit, args.index, args.out, args.suffix))
+            for path in normalize_inputs(iter_inputs(args.inputs)))
+
+    def target(path):
+        return output_path(path, args.profile, args.out, args.suffix)
+
+    def materialize(result, key, args_):
+        return link_file(result[0], target(key)), 0, None
+
+    dedup = Deduplicator(inode_identity, materialize)
+    claims = claim_outputs(target)
+
+    def recorded(results):
+        for key, result, error in results:
+            if error is None:
+                encoder_report.add(args.profile, result[1])
+                if result[2]:
+                    record_analysis(key, result[2])
+                record_output(key, result[0])
+                result = result[0]
+            yield key, result, error
+
+    try:
+        # Workery len počítajú a kódujú, zápis beží súbežne na samostatnom vlákne
+        # Dva vstupy s rovnakým výstupom (foo.jpg a foo.png) sa nahlásia ako chyba, nič sa neprepíše
+        results = write_results(run_jobs(render_file, dedup.filter(claims.filter(jobs)), args.workers))
+        results = claims.results(dedup.results(results))
+        return report("normalize", recorded(results), args.verbose)
+    finally:
+        if dedup.duplicates:
+            print(f"normalize: {dedup.duplicates} hardlinked inputs shared")
+        for line in encoder_report.lines():
+            print(f"normalize: {line}")
+
+
+def cmd_analyze(args):
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+    jobs = ((path, (path, memory_limit)) for path in iter_inputs(args.inputs))
+    counts = {"analyzed": 0, "indexed": 0}
+
+    def recorded(results):
+        # Do indexu zapisuje len tento proces, workery vracajú záznamy
+        for key, result, error in results:
+            if error is None:
+                if result:
+                    record_analysis(key, result)
+                    counts["analyzed"] += 1
+                    result = result["bbox"]
+                else:
+                    counts["indexed"] += 1
+                    result = "already indexed"
+            yield key, result, error
+
+    try:
+        return report("analyze", recorded(run_jobs(analyze_file, jobs, args.workers)), args.verbose)
+    finally:
+        print(f"analyze: {counts['analyzed']} analyzed, {counts['indexed']} already indexed")
+
+
+def iter_download_results(args, manifest, failed):
+    rows = (row for csv_file in args.csv for row in iter_csv_rows(csv_file))
+    max_bytes = args.max_size * 1024 * 1024 if args.max_size else None
+    results = run_downloads(rows, args.out, args.workers, args.timeout, max_bytes=max_bytes, manifest=manifest,
+                            skip_unchanged=args.skip_unchanged, retries=args.retries, per_host=args.per_host,
+                            rate=args.rate)
+    for (ean, img_url), result, error in results:
+        if error:
+            failed.append((ean, img_url, str(error)))
+            yield f"{ean} ({img_url})", None, error
+        else:
+            yield ean, f"{result[1]} ({result[0]})", None
+
+
+def cmd_download(args):
+    os.makedirs(args.out, exist_ok=True)
+    manifest = DownloadManifest(args.out)
+    failed = []
+    try:
+        return report("download", iter_download_results(args, manifest, failed), args.verbose)
+    finally:
+        manifest.save()
+        if args.failed_csv and failed:
+            write_failed_csv(args.failed_csv, failed)
+            print(f"download: failed rows written to {args.failed_csv}")
+        counts = manifest.counts
+        print(f"download: {counts['new']} new, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {counts['skipped']} skipped, {counts['transcoded']} transcoded to JPEG, "
+              f"{counts['linked']} linked to duplicates")
+
+
+def cmd_pipeline(args):
+    try:
+        get_profile(args.profile)
+        badges = parse_badges(args.tag, args.position, args.tags_dir)
+    except (ValueError, FileNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    encoder_report = EncoderReport()
+    rows = (row for csv_file in args.csv for row in iter_csv_rows(csv_file))
+    max_bytes = args.max_size * 1024 * 1024 if args.max_size else None
+
+    def recorded(results):
+        for (ean, img_url), result, error in results:
+            if error is not None:
+                yield f"{ean} ({img_url})", None, error
+                continue
+            encoder_report.add(args.profile, result[1])
+            yield ean, result[0], None
+
+    results = run_pipeline(rows, badges, args.out, args.max_side, args.profile, args.proxy, args.workers,
+                           args.download_workers, args.timeout, max_bytes, args.retries, args.per_host, args.rate)
+    try:
+        return report("pipeline", recorded(results), args.verbose)
+    finally:
+        for line in encoder_report.lines():
+            print(f"pipeline: {line}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="imgops", description="Headless batch image operations.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every processed file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tag = subparsers.add_parser("tag", help="put a tag overlay on images")
+    tag.add_argument("inputs", nargs="+", help="image files, globs, directories or CSV lists of paths")
+    tag.add_argument("--tag", required=True, action="append",
+                     help="tag file name from the tags directory, or a path, optionally with @ROW,COL; "
+                          "repeat to apply several tags in one pass")
+    tag.add_argument("--position", type=parse_position, default=(2, 0),
+                     help="grid cell as ROW,COL counted from 1 for tags without @ROW,COL (default: 3,1)")
+    tag.add_argument("--out", required=True, help="target folder for *_TAG.jpg files")
+    tag.add_argument("--tags-dir", default=IMAGE_PATH, help="directory with tag images")
+    tag.add_argument("--workers", type=int, default=default_worker_count())
+    tag.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE, help="encoder profile")
+    tag.add_argument("--force", action="store_true", help="rebuild outputs even if the manifest says they are up to date")
+    tag.set_defaults(func=cmd_tag)
+
+    normalize = subparsers.add_parser("normalize", help="autocrop, pad and resize images (in place unless --out/--suffix)")
+    normalize.add_argument("inputs", nargs="+", help="image files, globs, directories or CSV lists of paths")
+    normalize.add_argument("--max-side", type=int, default=1500)
+    normalize.add_argument("--workers", type=int, default=default_worker_count())
+    normalize.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                           help="encoder profile; non-JPEG profiles write next to the source with their own extension")
+    normalize.add_argument("--proxy", action="store_true",
+                           help="find the crop box on a reduced JPEG decode and decode only the resolution "
+                                "max-side needs (faster, framing within resampling tolerance)")
+    normalize.add_argument("--memory-limit", type=int, metavar="MB",
+                           help="process each image in horizontal bands under this memory ceiling per worker; "
+                                "uncompressed TIFF/BMP/PPM/TGA are also decoded band by band")
+    normalize.add_argument("--out", help="write outputs to this folder and keep the sources untouched")
+    normalize.add_argument("--suffix", default="", help="append this to output file names and keep the sources untouched")
+    normalize.add_argument("--index", action="store_true",
+                           help="reuse crop boxes from the analysis index next to the sources and record new ones")
+    normalize.set_defaults(func=cmd_normalize)
+
+    analyze = subparsers.add_parser("analyze", help="find crop boxes and store them in the analysis index only")
+    analyze.add_argument("inputs", nargs="+", help="image files, globs, directories or CSV lists of paths")
+    analyze.add_argument("--workers", type=int, default=default_worker_count())
+    analyze.add_argument("--memory-limit", type=int, metavar="MB",
+                         help="scan each image in horizontal bands under this memory ceiling per worker")
+    analyze.set_defaults(func=cmd_analyze)
+
+    download = subparsers.add_parser("download", help="download images listed in EAN/URL CSV files")
+    download.add_argument("csv", nargs="+", help="CSV files with EAN and URL columns")
+    download.add_argument("--out", required=True, help="target folder for <ean>.jpg files")
+    download.add_argument("--timeout", type=float, default=10)
+    download.add_argument("--workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                          help=f"parallel downloads sharing one keep-alive connection pool (default: {DEFAULT_DOWNLOAD_WORKERS})")
+    download.add_argument("--max-size", type=int, metavar="MB", default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                          help="reject images larger than this, 0 for no limit (default: %(default)s)")
+    download.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                          help="retries for timeouts, connection errors and 429/5xx responses, with exponential "
+                               "backoff; Retry-After is honored (default: %(default)s)")
+    download.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                          help="maximum concurrent requests to one host (default: %(default)s)")
+    download.add_argument("--rate", type=float, help="maximum requests per second to one host")
+    download.add_argument("--failed-csv", metavar="FILE",
+                          help="write permanently failed rows here as an EAN/URL CSV that can be downloaded again")
+    download.add_argument("--skip-unchanged", action="store_true",
+                          help="do not contact the server for rows whose URL and file match the manifest "
+                               "(default: revalidate them with conditional requests)")
+    download.set_defaults(func=cmd_download)
+
+    pipeline = subparsers.add_parser("pipeline", help="download, normalize and tag CSV rows in one pass, in memory")
+    pipeline.add_argument("csv", nargs="+", help="CSV files with EAN and URL columns")
+    pipeline.add_argument("--out", required=True, help="target folder for <ean>_TAG.jpg (or <ean>.jpg without tags)")
+    pipeline.add_argument("--tag", action="append", default=[],
+                          help="tag file name or path, optionally with @ROW,COL; repeatable, optional")
+    pipeline.add_argument("--position", type=parse_position, default=(2, 0),
+                          help="grid cell as ROW,COL counted from 1 for tags without @ROW,COL (default: 3,1)")
+    pipeline.add_argument("--tags-dir", default=IMAGE_PATH, help="directory with tag images")
+    pipeline.add_argument("--max-side", type=int, default=1500)
+    pipeline.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE, help="encoder profile")
+    pipeline.add_argument("--proxy", action="store_true", help="find the crop box on a reduced JPEG decode")
+    pipeline.add_argument("--workers", type=int, default=default_worker_count(), help="normalize/tag processes")
+    pipeline.add_argument("--download-workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS)
+    pipeline.add_argument("--timeout", type=float, default=10)
+    pipeline.add_argument("--max-size", type=int, metavar="MB", default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                          help="reject images larger than this, 0 for no limit (default: %(default)s)")
+    pipeline.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    pipeline.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST)
+    pipeline.add_argument("--rate", type=float, help="maximum requests per second to one host")
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
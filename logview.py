@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSortFilterProxyModel, Qt, QTimer
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QAbstractItemView, QListView
+
+# Stav riadku logu určuje farbu a dá sa podľa neho filtrovať
+STATUS_COLORS = {"failed": QColor("#C62828"), "info": QColor("#555555")}
+
+
+class LogModel(QAbstractListModel):
+    # Log dlhých dávok: v pamäti len posledných max_lines riadkov (kruhový buffer), nové riadky
+    # sa zbierajú a do modelu pridávajú dávkovo časovačom. Cena pre GUI tak nezávisí od počtu
+    # riadkov dávky. Celý log sa zároveň priebežne zapisuje do súboru (open_file).
+    StatusRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, max_lines=10000, interval=100, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self._lines = deque()
+        self._pending = deque(maxlen=max_lines)
+        self._file = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        status, text = self._lines[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return text
+        if role == self.StatusRole:
+            return status
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return STATUS_COLORS.get(status)
+        return None
+
+    def open_file(self, path):
+        self.close_file()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, status, text, visible=True):
+        # Jeden riadok bez zalomení, inak by rovnako vysoké riadky pohľadu nesedeli.
+        # S visible=False ide riadok len do súboru, okno v pamäti ostáva pre dôležité riadky.
+        text = " ".join(text.split())
+        if self._file is not None:
+            self._file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{status}\t{text}\n")
+        if not visible:
+            return
+        self._pending.append((status, text))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        if self._file is not None:
+            self._file.flush()
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        self._pending.clear()
+
+        overflow = len(self._lines) + len(batch) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+
+        self.beginInsertRows(QModelIndex(), len(self._lines), len(self._lines) + len(batch) - 1)
+        self._lines.extend(batch)
+        self.endInsertRows()
+
+    def clear(self):
+        self._pending.clear()
+        self.beginResetModel()
+        self._lines.clear()
+        self.endResetModel()
+
+
+class StatusFilter(QSortFilterProxyModel):
+    # Zobrazí len riadky so zvoleným stavom (None = všetky) z okna v pamäti
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.statuses = None
+        self.setSourceModel(model)
+
+    def set_statuses(self, statuses):
+        self.statuses = statuses
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        if self.statuses is None:
+            return True
+        index = self.sourceModel().index(row, 0, parent)
+        return self.sourceModel().data(index, LogModel.StatusRole) in self.statuses
+
+
+class LogView(QListView):
+    # Vykresľujú sa len viditeľné riadky; kým je pohľad na konci, nové riadky ho posúvajú ďalej
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setWordWrap(False)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsAboutToBeInserted.connect(self._remember_position)
+        model.rowsInserted.connect(self._follow)
+        self._at_bottom = True
+
+    def _remember_position(self, *args):
+        scrollbar = self.verticalScrollBar()
+        self._at_bottom = scrollbar.value() >= scrollbar.maximum()
+
+    def _follow(self, *args):
+        if self._at_bottom:
+            self.scrollToBottom()
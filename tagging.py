@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+from batch import file_hash, write_atomic
+from encoders import DEFAULT_PROFILE, encode_image, extension, get_profile
+
+
+def discover_tags(folder):
+    # Štítky sú všetky PNG v priečinku; 2x_pack je pred 10x_pack (prirodzené triedenie)
+    def natural_key(name):
+        return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+    try:
+        names = [entry.name for entry in os.scandir(folder)
+                 if entry.is_file() and entry.name.lower().endswith(".png")]
+    except OSError:
+        return []
+    return sorted(names, key=natural_key)
+
+
+def tag_thumbnail(tag_path, cache_dir, size=32):
+    # Náhľad na disku, kľúčom je cesta, mtime a veľkosť – zmenený štítok dostane nový náhľad
+    stat = os.stat(tag_path)
+    key = f"{os.path.abspath(tag_path)}|{stat.st_mtime_ns}|{size}"
+    thumb_path = os.path.join(cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(tag_path) as tag:
+        thumb = tag.convert("RGBA")
+    thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+    tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+    thumb.save(tmp_path, "PNG")
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+
+class TagOverlayCache:
+    # LRU cache štítkov: kľúč (súbor, mtime, veľkosť), hodnota je už zmenšený overlay
+    # rozdelený na RGB a alfa masku. Zdrojový PNG sa dekóduje raz a pre každú veľkosť
+    # sa resampluje tiež len raz.
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._overlays = OrderedDict()
+        self._sources = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tag_path, size):
+        tag_path = os.path.abspath(tag_path)
+        mtime = os.path.getmtime(tag_path)
+        key = (tag_path, mtime, tuple(size))
+
+        with self._lock:
+            overlay = self._overlays.get(key)
+            if overlay is not None:
+                self._overlays.move_to_end(key)
+                return overlay
+
+            source = self._load_source(tag_path, mtime)
+            resized = source.resize(key[2], Image.Resampling.LANCZOS)
+            overlay = (resized.convert("RGB"), resized.getchannel("A"))
+            self._overlays[key] = overlay
+            while len(self._overlays) > self.max_entries:
+                self._overlays.popitem(last=False)
+            return overlay
+
+    def _load_source(self, tag_path, mtime):
+        key = (tag_path, mtime)
+        source = self._sources.get(key)
+        if source is not None:
+            self._sources.move_to_end(key)
+            return source
+
+        with Image.open(tag_path) as tag:
+            source = tag.convert("RGBA")
+        self._sources[key] = source
+        while len(self._sources) > self.max_entries:
+            self._sources.popitem(last=False)
+        return source
+
+    def clear(self):
+        with self._lock:
+            self._overlays.clear()
+            self._sources.clear()
+
+
+overlay_cache = TagOverlayCache()
+
+MANIFEST_NAME = ".imgops_tags.json"
+
+
+def output_name(image_path, profile=DEFAULT_PROFILE):
+    base_name, ext = os.path.splitext(os.path.basename(image_path))
+    return f"{base_name}_TAG{extension(profile)}"
+
+
+def badges_recipe(badges, profile=DEFAULT_PROFILE):
+    # Štítky sa hashujú raz za dávku, nie pre každý obrázok
+    return {
+        "badges": [[file_hash(tag_path), list(position)] for tag_path, position in badges],
+        "encoder": dict(get_profile(profile), profile=profile),
+    }
+
+
+class TagManifest:
+    # Manifest v cieľovom priečinku: pre každý zdroj hash zdroja, štítkov, pozície a nastavenia enkódera.
+    # Výstupy, ktorých vstupy sa nezmenili, sa pri ďalšom behu preskočia. Kľúčom je cesta zdroja
+    # (relatívna k priečinku manifestu), nie názov výstupu – foo.png a foo.jpg majú rovnaký výstup.
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.entries = {}
+        self.counts = {"new": 0, "rebuilt": 0, "skipped": 0}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            pass
+
+    def key(self, image_path):
+        try:
+            return os.path.relpath(os.path.abspath(image_path), self.folder).replace(os.sep, "/")
+        except ValueError:
+            return os.path.abspath(image_path)  # iný disk vo Windows
+
+    def previous(self, image_path):
+        return self.entries.get(self.key(image_path))
+
+    def record(self, image_path, result):
+        status, save_path, entry, bytes_written = result
+        self.entries[self.key(image_path)] = entry
+        self.counts[status] += 1
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def apply_badges(img, badges, cache=None):
+    cache = cache or overlay_cache
+
+    # Základ ostáva v RGB – alfa sa mieša len v bunke mriežky, ktorú štítok prekrýva.
+    # RGB kanály vychádzajú rovnako ako pri pôvodnom RGBA paste a konverzii späť.
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    cell = (img.width // 3, img.height // 3)
+
+    for tag_path, position in badges:
+        tag_rgb, tag_alpha = cache.get(tag_path, cell)
+
+        x_offset = position[1] * cell[0]
+        y_offset = position[0] * cell[1]
+
+        img.paste(tag_rgb, (x_offset, y_offset), tag_alpha)
+    return img
+
+
+def tag_image(image_path, badges, target_folder, cache=None, profile=DEFAULT_PROFILE):
+    # badges je zoradený zoznam (cesta k štítku, (riadok, stĺpec)) – všetky sa nanesú
+    # na obrázok v pamäti a výstup sa kóduje iba raz podľa profilu enkódera.
+    # Zápis cez nový súbor a premenovanie – hardlinkovaný výstup iného vstupu sa tým nezmení.
+    img = apply_badges(Image.open(image_path), badges, cache)
+    save_path = os.path.join(target_folder, output_name(image_path, profile))
+    write_atomic(save_path, encode_image(img, profile))
+    return save_path
+
+
+def tag_image_incremental(image_path, badges, target_folder, recipe, previous=None, force=False):
+    # Vracia (stav, cesta výstupu, záznam do manifestu, zapísané bajty);
+    # stav je "new", "rebuilt" alebo "skipped"
+    profile = recipe["encoder"]["profile"]
+    entry = dict(recipe, source=file_hash(image_path))
+    save_path = os.path.join(target_folder, output_name(image_path, profile))
+
+    if not force and previous == entry and os.path.exists(save_path):
+        return "skipped", save_path, entry, 0
+
+    tag_image(image_path, badges, target_folder, profile=profile)
+    return ("rebuilt" if previous else "new"), save_path, entry, os.path.getsize(save_path)
@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import Deduplicator, claim_outputs
+
+
+def test_done_identities_are_bounded_at_scale():
+    # Milión unikátnych URL: hotové identity sa držia len v okne max_done, stav nerastie s počtom riadkov
+    dedup = Deduplicator(lambda key, args: key, lambda result, key, args: result, max_done=1000)
+    jobs = ((f"https://cdn.example.com/{i}.jpg", None) for i in range(1000 * 1000))
+    count = largest = 0
+    for key, result, error in dedup.results((key, key, None) for key, args in dedup.filter(jobs)):
+        count += 1
+        largest = max(largest, len(dedup._done) + len(dedup._primary) + len(dedup._waiting))
+    assert count == 1000 * 1000
+    assert largest <= 1000 + 2 and len(dedup._done) == 1000
+
+
+def test_evicted_identity_is_processed_again():
+    dedup = Deduplicator(lambda key, args: args, lambda result, key, args: result, max_done=1)
+    jobs = [("a1", "a"), ("b1", "b"), ("b2", "b"), ("a2", "a")]
+    processed = []
+
+    def process(jobs):
+        for key, args in jobs:
+            processed.append(key)
+            yield key, key, None
+
+    results = list(dedup.results(process(dedup.filter(jobs))))
+    assert processed == ["a1", "b1", "a2"]
+    assert ("b2", "b1", None) in results and dedup.duplicates == 1
+
+
+def process(jobs, failing=()):
+    for key, args in jobs:
+        if key in failing:
+            yield key, None, ValueError(key)
+        else:
+            yield key, f"out-{key}", None
+
+
+def test_duplicates_get_materialized_primary_result():
+    dedup = Deduplicator(lambda key, args: args, lambda result, key, args: f"{result}+{key}")
+    jobs = [("a", 1), ("b", 2), ("c", 1), ("d", 1)]
+    results = {key: (result, error) for key, result, error in dedup.results(process(dedup.filter(jobs)))}
+    assert results == {"a": ("out-a", None), "b": ("out-b", None), "c": ("out-a+c", None), "d": ("out-a+d", None)}
+    assert dedup.duplicates == 2
+
+
+def test_primary_error_is_shared_or_passed_as_none():
+    shared = Deduplicator(lambda key, args: args, lambda result, key, args: result)
+    results = list(shared.results(process(shared.filter([("a", 1), ("b", 1)]), failing=("a",))))
+    assert [(key, str(error)) for key, result, error in results] == [("a", "a"), ("b", "a")]
+
+    seen = []
+    own = Deduplicator(lambda key, args: args, lambda result, key, args: seen.append(result) or "own",
+                       share_errors=False)
+    results = list(own.results(process(own.filter([("a", 1), ("b", 1)]), failing=("a",))))
+    assert seen == [None] and results[1] == ("b", "own", None)
+
+
+def test_claim_outputs_refuses_second_input(tmp_path):
+    claims = claim_outputs(lambda key: os.path.join(str(tmp_path), os.path.splitext(key)[0] + ".jpg"))
+    jobs = [("p2.jpg", None), ("p2.png", None), ("p3.png", None)]
+    results = {key: error for key, result, error in claims.results(process(claims.filter(jobs)))}
+    assert results["p2.jpg"] is None and results["p3.png"] is None
+    assert "belongs to another input" in str(results["p2.png"])
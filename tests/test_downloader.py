@@ -0,0 +1,77 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from downloader import CsvRows, detect_columns, fetch_image
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / "rows.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_headerless_url_with_header_word_is_data():
+    assert detect_columns(["123", "https://cdn.x/img/a.jpg"], ["124", "https://cdn.x/img/b.jpg"]) == (False, 0, 1)
+
+
+def test_header_names_detected():
+    assert detect_columns(["Obrázok", "EAN"], ["https://x/a.jpg", "123"]) == (True, 1, 0)
+
+
+def test_headerless_single_row(tmp_path):
+    rows = CsvRows(write_csv(tmp_path, "123,https://cdn.x/image/a.jpg\n"))
+    assert list(rows) == [("123", "https://cdn.x/image/a.jpg")]
+
+
+def test_headerless_rows_keep_first(tmp_path):
+    rows = CsvRows(write_csv(tmp_path, "1,https://cdn.x/photo/1.jpg\n2,https://cdn.x/photo/2.jpg\n"))
+    assert [ean for ean, url in rows] == ["1", "2"]
+
+
+class FakeResponse:
+    # Odpoveď servera bez ETag a Last-Modified
+    def __init__(self, data):
+        self.data = data
+        self.status_code = 200
+        self.headers = {"Content-Length": str(len(data))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.data
+
+
+class FakeSession:
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.data)
+
+
+def test_same_content_without_validators_is_unchanged(tmp_path):
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 30), (200, 30, 30)).save(buffer, "JPEG")
+    session = FakeSession(buffer.getvalue())
+    url = "https://cdn.x/img/a.jpg"
+
+    status, img_path, entry = fetch_image("1", url, str(tmp_path), session=session)
+    assert status == "new"
+    inode = os.stat(img_path).st_ino
+
+    status, img_path, entry = fetch_image("1", url, str(tmp_path), session=session, previous=entry)
+    assert status == "unchanged"
+    assert os.stat(img_path).st_ino == inode
+    assert os.listdir(str(tmp_path)) == ["1.jpg"]
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import imgops
+
+TAGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+def save(path, color):
+    Image.new("RGB", (120, 80), color).save(str(path))
+    return str(path)
+
+
+def test_normalize_collision_fails_without_overwrite(tmp_path):
+    save(tmp_path / "foo.png", (200, 30, 30))
+    blue = save(tmp_path / "foo.jpg", (30, 30, 200))
+    # foo.jpg sa normalizuje na mieste, výstup foo.png by ho prepísal – ten sa odmietne
+    assert imgops.main(["normalize", str(tmp_path), "--workers", "1"]) == 1
+    with Image.open(blue) as image:
+        assert image.getpixel((60, 40))[2] > 150
+
+
+def test_normalize_in_place_rerun_succeeds(tmp_path):
+    save(tmp_path / "foo.png", (200, 30, 30))
+    save(tmp_path / "bar.bmp", (30, 30, 200))
+    for _ in range(2):
+        assert imgops.main(["normalize", str(tmp_path), "--workers", "1"]) == 0
+    assert sorted(name for name in os.listdir(str(tmp_path)) if not name.startswith(".")) == \
+        ["bar.bmp", "bar.jpg", "foo.jpg", "foo.png"]
+
+
+def test_tag_collision_keeps_first_output(tmp_path):
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    save(inputs / "p2.jpg", (30, 30, 200))
+    save(inputs / "p2.png", (200, 30, 30))
+    out = str(tmp_path / "out")
+    tag = sorted(os.listdir(TAGS_DIR))[0]
+    argv = ["tag", str(inputs), "--tag", tag, "--tags-dir", TAGS_DIR, "--out", out, "--workers", "1"]
+    assert imgops.main(argv) == 1
+    assert os.listdir(out).count("p2_TAG.jpg") == 1
+    with Image.open(os.path.join(out, "p2_TAG.jpg")) as image:
+        assert image.getpixel((60, 40))[2] > 150
+
+    # Manifest je podľa zdroja: druhý beh p2.jpg preskočí a p2.png opäť odmietne
+    assert imgops.main(argv) == 1
+    with Image.open(os.path.join(out, "p2_TAG.jpg")) as image:
+        assert image.getpixel((60, 40))[2] > 150
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import normalizer
+
+
+def test_proxy_keeps_feature_missed_by_draft(tmp_path):
+    # Jemná 3 px linka nad produktom sa v náhľade 1/8 stratí, spresnenie ju musí nájsť
+    path = str(tmp_path / "line.jpg")
+    image = Image.new("RGB", (4000, 3000), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((1200, 1400, 2800, 2800), fill=(40, 90, 160))
+    draw.rectangle((1999, 200, 2001, 1400), fill=(244, 244, 244))
+    image.save(path, quality=95)
+
+    with Image.open(path) as source:
+        left, top, right, bottom = normalizer.find_foreground_bbox(source.convert("RGB"))
+    cropped = normalizer.autocrop_proxy(path, max_side=8000)
+    assert abs(cropped.size[0] - (right - left)) <= 2
+    assert abs(cropped.size[1] - (bottom - top)) <= 2
+
+
+def test_rerun_skips_outputs_of_sibling_sources(tmp_path):
+    # foo.jpg vytvorený z foo.png nie je pri ďalšom behu zdroj a smie sa prepísať
+    source = str(tmp_path / "foo.png")
+    Image.new("RGB", (60, 40), (200, 30, 30)).save(source)
+    save_path = normalizer.output_path(source)
+    Image.new("RGB", (60, 40), (200, 30, 30)).save(save_path)
+    normalizer.record_output(source, save_path)
+
+    inputs = [source, save_path]
+    assert list(normalizer.normalize_inputs(inputs)) == [source]
+    assert normalizer.output_path(source) == save_path
+
+
+def test_unrelated_sibling_is_not_overwritten(tmp_path):
+    source = str(tmp_path / "foo.png")
+    Image.new("RGB", (60, 40), (200, 30, 30)).save(source)
+    Image.new("RGB", (60, 40), (30, 30, 200)).save(str(tmp_path / "foo.jpg"))
+    with pytest.raises(ValueError):
+        normalizer.output_path(source)
+
+
+def test_index_skips_malformed_lines_and_duplicates(tmp_path):
+    image_path = str(tmp_path / "a.jpg")
+    path = normalizer.index_path(image_path)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('{"threshold": 10}\n[1, 2]\n{"hash": "abc", "threshold": 10}\n{"hash": "de')
+    assert list(normalizer.load_index(path)) == ["abc"]
+
+    entry = {"hash": "xyz", "threshold": 10}
+    normalizer.record_analysis(image_path, entry)
+    normalizer.record_analysis(str(tmp_path / "b.jpg"), dict(entry))
+    with open(path, encoding="utf-8") as file:
+        assert file.read().count('"xyz"') == 1
+    assert normalizer.lookup_analysis(image_path, "xyz") == entry
+
+
+def product_photo(path, size=(2400, 1800)):
+    # Produkt na takmer bielom pozadí s jemným šumom, ako v korpuse bench.py
+    rng = np.random.default_rng(7)
+    background = rng.normal(249, 0.4, (size[1], size[0], 1)).clip(248, 250).repeat(3, axis=2)
+    image = Image.fromarray(background.astype(np.uint8))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((700, 300, 1900, 1500), fill=(180, 40, 60))
+    draw.rectangle((1100, 1400, 1500, 1650), fill=(30, 60, 120))
+    image.save(path, quality=92)
+    return path
+
+
+@pytest.mark.parametrize("options", [{"proxy": True}, {"memory_limit": 4 * 1024 * 1024}])
+def test_proxy_and_strip_match_full_path(tmp_path, options):
+    path = product_photo(str(tmp_path / "product.jpg"))
+    full = normalizer.full_batch_gimp_style(path, max_side=800)
+    other = normalizer.full_batch_gimp_style(path, max_side=800, **options)
+    assert other.size == full.size
+    difference = np.abs(np.asarray(other, dtype=np.int16) - np.asarray(full, dtype=np.int16))
+    assert difference.mean() < 1.0
+
+
+def test_index_round_trip(tmp_path):
+    path = product_photo(str(tmp_path / "product.jpg"))
+    entry = normalizer.analyze_file(path)
+    normalizer.record_analysis(path, entry)
+    normalizer._records_cache.clear()
+
+    assert normalizer.analyze_file(path) is None
+    stored = normalizer.lookup_analysis(path, entry["hash"])
+    assert stored == entry
+    indexed = normalizer.full_batch_gimp_style(path, max_side=800, analysis=dict(stored))
+    assert indexed.tobytes() == normalizer.full_batch_gimp_style(path, max_side=800).tobytes()